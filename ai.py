@@ -1,5 +1,11 @@
-import requests
+import argparse
+import hashlib
+import importlib.util
 import json
+import re
+import signal
+import socket
+import sqlite3
 import sys
 import time
 import os
@@ -10,9 +16,24 @@ COLOR_GREEN = "\033[92m"
 COLOR_BLUE = "\033[94m"
 COLOR_RESET = "\033[0m"
 MODEL_NAME = "gemini-2.5-flash-preview-09-2025"
-API_ENDPOINT = "https://generativelanguage.googleapis.com/v1beta/models/"
+# Override with GEMINI_API_ENDPOINT, e.g. to point at a local test server
+API_ENDPOINT = os.environ.get('GEMINI_API_ENDPOINT', "https://generativelanguage.googleapis.com/v1beta/models/")
 MAX_RETRIES = 3
 INITIAL_DELAY = 1  # seconds
+BATCH_CONCURRENCY = 4  # questions in flight at once with --batch
+# --repl and --daemon keep the conversation for follow-up questions
+CONTEXT_TURNS = 6       # earlier question/answer pairs sent along
+CONTEXT_IDLE = 15 * 60  # seconds of silence after which a conversation starts over
+SOCKET_PATH = os.environ.get('AI_SOCKET', os.path.expanduser("~/.cache/ai/daemon.sock"))
+# Answers are cached on disk so repeated questions skip the network
+CACHE_FILE = os.environ.get('AI_CACHE', os.path.expanduser("~/.cache/ai/responses.db"))
+CACHE_TTL = 7 * 24 * 3600  # seconds before a cached answer is asked again
+CACHE_MAX_ENTRIES = 500    # least recently used answers are dropped beyond this
+NO_TEXT = 'No response text found.'  # shown when the model sent no text; never cached
+
+# --- FINAL STRICT SYSTEM INSTRUCTION ---
+# Forces a two-line output: Explanation + Explicit Command Template.
+SYSTEM_INSTRUCTION = "You are a helpful and extremely concise Linux command line assistant for Termux. Always answer with a single sentence explanation first. If the question asks for a command, the next line MUST contain the full command template using placeholder variables (e.g., 'mv current_name new_name'). Do not use Markdown code blocks or extra formatting."
 # ---------------------
 
 def get_api_key():
@@ -27,49 +48,46 @@ def get_api_key():
         sys.exit(1)
     return api_key
 
-def generate_content(prompt, api_key):
-    """Calls the Gemini API with Google Search grounding and exponential backoff."""
-    
-    url = f"{API_ENDPOINT}{MODEL_NAME}:generateContent?key={api_key}"
-    
-    # --- FINAL STRICT SYSTEM INSTRUCTION ---
-    # Forces a two-line output: Explanation + Explicit Command Template.
-    system_instruction = "You are a helpful and extremely concise Linux command line assistant for Termux. Always answer with a single sentence explanation first. If the question asks for a command, the next line MUST contain the full command template using placeholder variables (e.g., 'mv current_name new_name'). Do not use Markdown code blocks or extra formatting."
-    
-    payload = {
-        "contents": [{ "parts": [{ "text": prompt }] }],
+def build_payload(prompt, history=()):
+    """Request body; `history` holds earlier (question, answer) pairs of the conversation."""
+    contents = []
+    for question, answer in history:
+        contents.append({ "role": "user", "parts": [{ "text": question }] })
+        contents.append({ "role": "model", "parts": [{ "text": answer }] })
+    contents.append({ "role": "user", "parts": [{ "text": prompt }] })
+    return {
+        "contents": contents,
         "tools": [{ "google_search": {} }], # Enable Google Search for current info
-        "systemInstruction": { "parts": [{ "text": system_instruction }] },
+        "systemInstruction": { "parts": [{ "text": SYSTEM_INSTRUCTION }] },
     }
+
+def grounding_sources(candidate):
+    """'Title (uri)' for each web source the answer was grounded on."""
+    sources = []
+    grounding_metadata = candidate.get('groundingMetadata', {})
+    attributions = grounding_metadata.get('groundingAttributions', [])
     
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = requests.post(
-                url, 
-                headers={'Content-Type': 'application/json'}, 
-                data=json.dumps(payload),
-                timeout=30
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            candidate = result.get('candidates', [{}])[0]
-            
-            # Extract Text
-            text = candidate.get('content', {}).get('parts', [{}])[0].get('text', 'No response text found.')
+    for attr in attributions:
+        web = attr.get('web', {})
+        if web and web.get('title') and web.get('uri'):
+            sources.append(f"{web['title']} ({web['uri']})")
+    return sources
 
-            # Extract Sources
-            sources = []
-            grounding_metadata = candidate.get('groundingMetadata', {})
-            attributions = grounding_metadata.get('groundingAttributions', [])
-            
-            for attr in attributions:
-                web = attr.get('web', {})
-                if web and web.get('title') and web.get('uri'):
-                    sources.append(f"{web['title']} ({web['uri']})")
+class RequestFailed(Exception):
+    """No answer after MAX_RETRIES attempts."""
 
-            return text, sources
-            
+class StreamInterrupted(RequestFailed):
+    """The stream broke after part of the answer was printed, so retrying would repeat it."""
+
+def with_retries(call):
+    """Runs call() up to MAX_RETRIES times with exponential backoff between attempts."""
+    import requests # imported here so cached answers don't pay for it
+
+    for attempt in range(MAX_RETRIES):
+        try:
+            return call()
+        except StreamInterrupted:
+            raise
         except requests.exceptions.HTTPError as e:
             print(f"HTTP Error on attempt {attempt + 1}: {e}", file=sys.stderr)
         except requests.exceptions.RequestException as e:
@@ -80,47 +98,482 @@ def generate_content(prompt, api_key):
         if attempt < MAX_RETRIES - 1:
             delay = INITIAL_DELAY * (2 ** attempt)
             time.sleep(delay)
-        else:
-            print("Failed to get a response after maximum retries.", file=sys.stderr)
-            sys.exit(1)
-            
-    return "Error: Could not retrieve a response from the API.", []
 
+    raise RequestFailed("Failed to get a response after maximum retries.")
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: ai <question>", file=sys.stderr)
-        print("Example: ai 'What is the command for renaming a file?'", file=sys.stderr)
-        sys.exit(1)
+def generate_content(prompt, api_key, session=None, history=()):
+    """
+    Calls the Gemini API with Google Search grounding and exponential backoff.
+    Pass a requests.Session to reuse its pooled connections across calls.
+    """
+    import requests
+    
+    url = f"{API_ENDPOINT}{MODEL_NAME}:generateContent?key={api_key}"
+
+    def call():
+        response = (session or requests).post(
+            url, 
+            headers={'Content-Type': 'application/json'}, 
+            data=json.dumps(build_payload(prompt, history)),
+            timeout=30
+        )
+        response.raise_for_status()
         
-    prompt = " ".join(sys.argv[1:])
+        result = response.json()
+        candidate = result.get('candidates', [{}])[0]
+        
+        # Extract Text
+        text = (candidate.get('content', {}).get('parts') or [{}])[0].get('text') or NO_TEXT
+        return text, grounding_sources(candidate)
+
+    return with_retries(call)
+
+def stream_content(prompt, api_key, on_text, session=None, history=()):
+    """
+    Like generate_content, but over the SSE streamGenerateContent endpoint: on_text(chunk) is
+    called as each piece of the answer arrives. Sources usually come with the last event.
+    """
+    import requests
+
+    url = f"{API_ENDPOINT}{MODEL_NAME}:streamGenerateContent?alt=sse&key={api_key}"
+
+    def call():
+        parts, sources = [], []
+        with (session or requests).post(
+            url,
+            headers={'Content-Type': 'application/json'},
+            data=json.dumps(build_payload(prompt, history)),
+            timeout=30,
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            response.encoding = 'utf-8'
+            try:
+                # chunk_size=None hands over each event as soon as it arrives instead of filling a buffer
+                for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                    if not line.startswith('data:'):
+                        continue
+                    candidate = json.loads(line[5:]).get('candidates', [{}])[0]
+                    chunk = "".join(part.get('text', '') for part in candidate.get('content', {}).get('parts', []))
+                    if chunk:
+                        parts.append(chunk)
+                        on_text(chunk)
+                    sources.extend(source for source in grounding_sources(candidate) if source not in sources)
+            except Exception as e:
+                if parts:
+                    raise StreamInterrupted(f"Stream interrupted: {e}") from e
+                raise
+        return "".join(parts) or NO_TEXT, sources
+
+    return with_retries(call)
+
+
+# --- Response Cache ---
+def cache_key(prompt):
+    """
+    Key for a question: the prompt with case, spacing and trailing punctuation normalized,
+    plus the model and a hash of the system instruction, so changing either asks afresh.
+    """
+    normalized = re.sub(r"\s+", " ", prompt).strip().rstrip("?!. ").lower()
+    instruction = hashlib.sha256(SYSTEM_INSTRUCTION.encode()).hexdigest()
+    return hashlib.sha256(json.dumps([normalized, MODEL_NAME, instruction]).encode()).hexdigest()
+
+def open_cache():
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    conn = sqlite3.connect(CACHE_FILE)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS responses (
+            key       TEXT PRIMARY KEY,
+            prompt    TEXT NOT NULL,
+            text      TEXT NOT NULL,
+            sources   TEXT NOT NULL,
+            created   REAL NOT NULL,
+            last_used REAL NOT NULL
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS responses_by_use ON responses (last_used)")
+    return conn
+
+def cache_get(conn, prompt):
+    """(text, sources) if the question was answered within CACHE_TTL, else None."""
+    key = cache_key(prompt)
+    row = conn.execute("SELECT text, sources, created FROM responses WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None
+    with conn:
+        if time.time() - row[2] > CACHE_TTL:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+    return row[0], json.loads(row[1])
+
+def cache_put(conn, prompt, text, sources):
+    """
+    Stores an answer, then drops expired entries and the least recently used beyond CACHE_MAX_ENTRIES.
+    An answer without text (NO_TEXT) isn't stored, so the question is asked again next time.
+    """
+    if text == NO_TEXT:
+        return
+    now = time.time()
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                     (cache_key(prompt), prompt, text, json.dumps(sources), now, now))
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - CACHE_TTL,))
+        conn.execute("""DELETE FROM responses WHERE key IN (
+                            SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)""",
+                     (CACHE_MAX_ENTRIES,))
+# ---------------------
+
+# --- Batch Mode ---
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run_batch(prompts, api_key, cache=None, refresh=False, concurrency=BATCH_CONCURRENCY, out=sys.stdout):
+    """
+    Answers many questions over one pooled requests.Session with up to `concurrency` in flight,
+    each retried like a single question. Writes one JSON line per answer as it completes (with
+    its 0-based 'index' in the input) and returns (latencies of network answers, cached, failed).
+    """
+    import requests
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    def ask(index, prompt):
+        start = time.perf_counter()
+        try:
+            text, sources = generate_content(prompt, api_key, session)
+            error = None
+        except RequestFailed as e:
+            text, sources, error = None, [], str(e)
+        return index, prompt, text, sources, error, time.perf_counter() - start
+
+    def emit(record):
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+
+    latencies, cached, failed = [], 0, 0
+    with session, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = []
+        for index, prompt in enumerate(prompts):
+            hit = cache_get(cache, prompt) if cache and not refresh else None
+            if hit:
+                cached += 1
+                emit({"index": index, "prompt": prompt, "text": hit[0], "sources": hit[1], "cached": True, "latency_ms": 0})
+            else:
+                futures.append(pool.submit(ask, index, prompt))
+
+        # Results are written (and cached) from this thread only, as they complete
+        for future in as_completed(futures):
+            index, prompt, text, sources, error, latency = future.result()
+            record = {"index": index, "prompt": prompt, "text": text, "sources": sources, "cached": False,
+                      "latency_ms": round(latency * 1000)}
+            if error:
+                failed += 1
+                record["error"] = error
+            else:
+                latencies.append(latency)
+                if cache:
+                    cache_put(cache, prompt, text, sources)
+            emit(record)
+    return latencies, cached, failed
+
+def batch_main(args, cache):
+    source = sys.stdin if args.batch == '-' else open(args.batch, encoding='utf-8')
+    with source:
+        prompts = [line.strip() for line in source if line.strip()]
     api_key = get_api_key()
-    
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+
+    start = time.perf_counter()
+    try:
+        latencies, cached, failed = run_batch(prompts, api_key, cache, args.refresh, max(1, args.concurrency), out)
+    finally:
+        if args.output:
+            out.close()
+    elapsed = time.perf_counter() - start
+
+    summary = (f"{'⚠️ ' if failed else '✅'} {len(prompts)} questions ({cached} cached, {failed} failed) in {elapsed:.2f} s, "
+               f"{len(prompts) / elapsed if elapsed else 0:.1f}/s")
+    if latencies:
+        summary += f" | p50 {percentile(latencies, 0.5) * 1000:.0f} ms | p95 {percentile(latencies, 0.95) * 1000:.0f} ms"
+    print(summary, file=sys.stderr)
+    if failed:
+        sys.exit(1)
+# ---------------------
+
+# --- REPL & Daemon ---
+class Assistant:
+    """
+    What answering needs, kept warm between questions: the API key, a pooled HTTPS session,
+    the cache connection and the conversation so far. Used by --repl, --daemon and single questions.
+    """
+
+    def __init__(self, use_cache=True):
+        self._api_key = None
+        self._session = None
+        self.cache = open_cache() if use_cache else None
+        self.history = []
+        self.last_used = 0
+
+    @property
+    def api_key(self):
+        if self._api_key is None:
+            self._api_key = get_api_key()
+        return self._api_key
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+
+    def reset(self):
+        self.history = []
+
+    def ask(self, prompt, on_text=None, refresh=False, use_cache=True):
+        """
+        (text, sources, cached). Streams through on_text if given. Only the first question of a
+        conversation is cached, since a follow-up's answer depends on what came before.
+        """
+        if time.time() - self.last_used > CONTEXT_IDLE:
+            self.reset()
+        cache = self.cache if use_cache and not self.history else None
+        cached = cache_get(cache, prompt) if cache and not refresh else None
+        if cached:
+            text, sources = cached
+        elif on_text:
+            text, sources = stream_content(prompt, self.api_key, on_text, self.session, self.history)
+        else:
+            text, sources = generate_content(prompt, self.api_key, self.session, self.history)
+        if cache and not cached:
+            cache_put(cache, prompt, text, sources)
+        self.history = (self.history + [(prompt, text)])[-CONTEXT_TURNS:]
+        self.last_used = time.time()
+        return text, sources, bool(cached)
+
+def repl(assistant, refresh=False, timing=False):
+    """Interactive loop; answers stream in and follow-up questions keep the context."""
+    try:
+        import readline # arrow keys and history for input(), where available
+    except ImportError:
+        pass
+    print(f"{COLOR_BLUE}🤖 Gemini REPL{COLOR_RESET}: follow-up questions keep the context. /new starts over, /quit or Ctrl-D exits.")
+    while True:
+        try:
+            line = input(f"{COLOR_GREEN}ai>{COLOR_RESET} ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return
+        if not line:
+            continue
+        if line in ("/quit", "/exit"):
+            return
+        if line == "/new":
+            assistant.reset()
+            print("(new conversation)")
+            continue
+        try:
+            show_answer(lambda prompt, on_text: assistant.ask(prompt, on_text, refresh), line, True, timing)
+        except KeyboardInterrupt:
+            print("\n(interrupted)")
+
+def serve(assistant, path=SOCKET_PATH):
+    """
+    Answers questions from thin clients on a Unix socket, one at a time. A request is one JSON
+    line; the reply is {"chunk"} lines while streaming, then {"text", "sources", "cached"} or {"error"}.
+    """
+    if connect_daemon(path):
+        print(f"An ai daemon is already listening on {path}.", file=sys.stderr)
+        sys.exit(1)
+    if os.path.exists(path):
+        os.remove(path) # left over from a daemon that did not exit cleanly
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    os.chmod(path, 0o600)
+    server.listen(8)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    assistant.api_key # fail now rather than on the first question
+    print(f"🤖 ai daemon listening on {path}")
+    try:
+        while True:
+            conn, _ = server.accept()
+            try:
+                with conn:
+                    handle_client(assistant, conn)
+            except Exception as e: # one bad client must not take down the warm process
+                print(f"Client error: {e}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(path)
+
+def handle_client(assistant, conn):
+    """Answers the one request on `conn`; a client that hangs up mid-answer just stops the stream."""
+    gone = False
+
+    with conn.makefile('r', encoding='utf-8') as rfile, conn.makefile('w', encoding='utf-8') as wfile:
+        def send(message):
+            nonlocal gone
+            if gone:
+                return
+            try:
+                wfile.write(json.dumps(message) + "\n")
+                wfile.flush()
+            except OSError:
+                gone = True
+
+        def on_text(chunk):
+            send({"chunk": chunk})
+            if gone:
+                raise ConnectionAbortedError("client disconnected")
+
+        request = json.loads(rfile.readline() or "{}")
+        if not request.get("prompt"):
+            return # e.g. the liveness check of connect_daemon()
+        if not request.get("continue"):
+            assistant.reset()
+        try:
+            text, sources, cached = assistant.ask(
+                request["prompt"], on_text if request.get("stream") else None,
+                request.get("refresh", False), not request.get("no_cache", False))
+        except RequestFailed as e:
+            send({"error": str(e)})
+            return
+        send({"text": text, "sources": sources, "cached": cached})
+
+def connect_daemon(path=SOCKET_PATH):
+    """A socket connected to a running `ai --daemon`, or None."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        return client
+    except OSError:
+        client.close()
+        return None
+
+def ask_daemon(client, request, on_text=None):
+    """Sends one question over a connect_daemon() socket; same result as Assistant.ask."""
+    with client, client.makefile('r', encoding='utf-8') as rfile:
+        client.sendall((json.dumps(dict(request, stream=on_text is not None)) + "\n").encode())
+        for line in rfile:
+            message = json.loads(line)
+            if "chunk" in message:
+                on_text(message["chunk"])
+            elif "error" in message:
+                raise RequestFailed(message["error"])
+            else:
+                return message["text"], message["sources"], message["cached"]
+    raise RequestFailed("The ai daemon closed the connection without answering.")
+# ---------------------
+
+def show_answer(ask, prompt, stream=False, timing=False):
+    """
+    Asks through ask(prompt, on_text) -> (text, sources, cached) and prints the answer, as it
+    arrives when streaming. Returns False if no answer could be had.
+    """
+    start = time.perf_counter()
+    first_token = None
+
     # Show loading message
     print("🤖 Thinking...", end='\r')
     sys.stdout.flush()
-    
-    text, sources = generate_content(prompt, api_key)
-    
-    # Clear "Thinking..." message
-    print(" " * 20, end='\r') 
-    
-    # Print Answer
-    print(f"\n{COLOR_GREEN}>>> Gemini Response:{COLOR_RESET}")
-    print(text)
-    
-    # Print Sources
+
+    def show(chunk):
+        nonlocal first_token
+        if first_token is None:
+            first_token = time.perf_counter()
+            print(" " * 20, end='\r')
+            print_header()
+        print(chunk, end='', flush=True)
+
+    try:
+        text, sources, cached = ask(prompt, show if stream else None)
+    except RequestFailed as e:
+        print(f"\n{e}" if first_token else f"{' ' * 20}\r{e}", file=sys.stderr)
+        return False
+
+    if first_token is None: # not streamed: cached, or a whole response at once
+        # Clear "Thinking..." message
+        print(" " * 20, end='\r')
+        print_header(cached)
+        print(text, end='')
+    if not text.endswith("\n"):
+        print()
+    print_sources(sources)
+
+    if timing:
+        total = time.perf_counter() - start
+        first = (first_token - start) if first_token else total
+        print(f"⏱  first token: {first * 1000:.0f} ms | total: {total * 1000:.0f} ms"
+              f"{' (cached)' if cached else ''}", file=sys.stderr)
+    return True
+
+def print_header(cached=False):
+    print(f"\n{COLOR_GREEN}>>> Gemini Response{' (cached)' if cached else ''}:{COLOR_RESET}")
+
+def print_sources(sources):
     if sources:
         print(f"\n{COLOR_BLUE}--- Sources ---{COLOR_RESET}")
         for source in sources:
             print(f"  * {source}")
     print()
 
+def main():
+    parser = argparse.ArgumentParser(
+        prog="ai", description="Ask Gemini a quick question from the terminal.",
+        epilog="Example: ai 'What is the command for renaming a file?'")
+    parser.add_argument("question", nargs="*", help="The question to ask")
+    parser.add_argument("-s", "--stream", action="store_true", help="Print the answer as it is generated")
+    parser.add_argument("--timing", action="store_true", help="Report time to first token and total latency")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor store the cached answer")
+    parser.add_argument("--refresh", action="store_true", help="Ask again and replace the cached answer")
+    parser.add_argument("--batch", metavar="FILE", help="Answer one question per line of FILE ('-' for stdin) as JSON lines")
+    parser.add_argument("-j", "--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help=f"Questions in flight at once with --batch (default: {BATCH_CONCURRENCY})")
+    parser.add_argument("-o", "--output", metavar="FILE", help="Write --batch results to FILE instead of stdout")
+    parser.add_argument("--repl", action="store_true", help="Interactive session; follow-up questions keep the context")
+    parser.add_argument("--daemon", action="store_true",
+                        help=f"Serve questions on a Unix socket ({SOCKET_PATH}) with a warm connection and cache")
+    parser.add_argument("-c", "--continue", dest="follow_up", action="store_true",
+                        help="Follow up on the previous question (needs a running --daemon)")
+    parser.add_argument("--no-daemon", action="store_true", help="Answer in this process even if a daemon is running")
+    args = parser.parse_args()
+    if args.batch:
+        batch_main(args, None if args.no_cache else open_cache())
+        return
+    if args.daemon:
+        serve(Assistant(use_cache=not args.no_cache))
+        return
+    if args.repl:
+        repl(Assistant(use_cache=not args.no_cache), args.refresh, args.timing)
+        return
+    if not args.question:
+        parser.error("a question is required (or use --batch, --repl or --daemon)")
+
+    prompt = " ".join(args.question)
+    client = None if args.no_daemon else connect_daemon()
+    if client:
+        request = {"prompt": prompt, "refresh": args.refresh, "no_cache": args.no_cache, "continue": args.follow_up}
+        ask = lambda prompt, on_text: ask_daemon(client, request, on_text)
+    else:
+        if args.follow_up:
+            print("(no ai daemon running: asking without the earlier context)", file=sys.stderr)
+        assistant = Assistant(use_cache=not args.no_cache)
+        ask = lambda prompt, on_text: assistant.ask(prompt, on_text, args.refresh)
+    if not show_answer(ask, prompt, args.stream, args.timing):
+        sys.exit(1)
+
 if __name__ == '__main__':
     # Ensure requests is installed (Termux may not have it by default)
-    try:
-        import requests
-    except ImportError:
+    if importlib.util.find_spec('requests') is None:
         print("The 'requests' library is not installed.", file=sys.stderr)
         print("Run: pip install requests", file=sys.stderr)
         sys.exit(1)
@@ -1,15 +1,46 @@
 #!/usr/bin/env python3
 import argparse
+import fcntl
+import hashlib
+import heapq
+import itertools
 import json
+import math
 import os
+import re
+import select
+import sqlite3
 import subprocess
+import threading
+import time
 from datetime import datetime
 import tempfile
 import sys
-VERSION= "1.1.0"
+import termios
+import tty
+import zlib
+VERSION= "1.2.0"
 
 # --- Configuration & Paths ---
 DB_FILE = os.path.expanduser("~/.kb_data.json")
+SQLITE_FILE = os.path.expanduser("~/.kb_data.db")
+
+INDEX_FILE = os.path.expanduser("~/.kb_index.db") # Search index sidecar for the JSON backend
+
+# Storage backend: 'sqlite' (default), 'json' (the original single-file format)
+# or 'journal' (the JSON snapshot plus an append-only write-ahead journal)
+STORAGE_BACKEND = os.environ.get('KB_BACKEND', 'sqlite')
+JOURNAL_COMPACT_BYTES = 1024 * 1024 # fold the journal into a new snapshot past this size
+
+# BM25 ranking parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 2      # a title token counts as this many content tokens
+MAX_PREFIX_TERMS = 256 # cap on tokens a 'prefix*' term expands to
+PREVIEW_CHARS = 150    # content shown by list/search previews
+FUZZY_THRESHOLD = 0.3  # minimum trigram similarity for `kb search --fuzzy`
+LISTING_FIELDS = ('id', 'title', 'tags', 'date') # what streamed reads keep of each note
+BLOB_COMPRESS_MIN = 256 # note bodies shorter than this (in bytes) are stored uncompressed
 
 # Define the user's preferred editor (defaults to nano if EDITOR is not set)
 EDITOR = os.environ.get('EDITOR', 'nano')
@@ -23,22 +54,989 @@ BOLD = '\033[1m'
 RESET = '\033[0m'
 
 # --- Database Handling ---
-def load_db():
-    if not os.path.exists(DB_FILE):
+def load_db(path=None):
+    path = path or DB_FILE
+    if not os.path.exists(path):
         return []
     try:
-        with open(DB_FILE, 'r') as f:
+        with open(path, 'r') as f:
             return json.load(f)
     except json.JSONDecodeError:
         return []
 
-def save_db(data):
+def _fsync_dir(path):
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _write_synced(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+
+def save_db(data, path=None):
     # Ensure all integers are saved as integers (especially 'id')
     for item in data:
         if 'id' in item:
             item['id'] = int(item['id'])
-    with open(DB_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+    # Write beside the DB and rename over it, so a crash leaves either the old or the new file
+    path = path or DB_FILE
+    _write_synced(data, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    _fsync_dir(path)
+
+def read_journal(path, limit=None):
+    """Yields journal records in order, stopping at a torn last line left by a crash mid-append."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        data = f.read() if limit is None else f.read(limit)
+    for line in data.split(b"\n")[:-1]: # the piece after the last newline is incomplete
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            return
+
+def journal_changes(path, limit=None):
+    """id -> latest note in the journal, or None when its last record is a deletion."""
+    changes = {}
+    for record in read_journal(path, limit):
+        changes[record['id']] = None if record['op'] == 'delete' else record['note']
+    return changes
+
+def replay_journal(notes, path, limit=None):
+    """Applies journal records to an id -> note map. Records are keyed by id, so replaying twice is harmless."""
+    for note_id, note in journal_changes(path, limit).items():
+        if note is None:
+            notes.pop(note_id, None)
+        else:
+            notes[note_id] = note
+    return notes
+
+def iter_json_list(path, chunk_size=1 << 16):
+    """
+    Yields the objects of a JSON list file one at a time, so memory holds a single record
+    (plus one read chunk) no matter how large the file is. Stops quietly at a corrupt tail.
+    """
+    if not os.path.exists(path):
+        return
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as f:
+        buf, pos, eof = "", 0, False
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,[]":
+                pos += 1
+            if pos < len(buf):
+                try:
+                    obj, pos = decoder.raw_decode(buf, pos)
+                    yield obj
+                    continue
+                except json.JSONDecodeError:
+                    if eof:
+                        return
+            elif eof:
+                return
+            # Need more input: keep the unparsed rest and read at least as much again
+            more = f.read(max(chunk_size, len(buf) - pos))
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+
+def project_note(note, preview=0, full=False):
+    """Copy of a note with just the listing fields, plus a `preview` of the content when asked."""
+    if full:
+        return dict(note)
+    listed = {field: note.get(field) for field in LISTING_FIELDS}
+    if preview:
+        listed['preview'] = (note.get('content') or "")[:preview]
+    return listed
+
+def content_hash(content):
+    """Address of a note body in the SQLite blob store."""
+    return hashlib.sha256((content or "").encode()).hexdigest()
+
+def pack_blob(content, compress=True):
+    """(data, compressed) for a note body; zlib only pays off past BLOB_COMPRESS_MIN bytes."""
+    data = (content or "").encode()
+    if compress and len(data) >= BLOB_COMPRESS_MIN:
+        packed = zlib.compress(data)
+        if len(packed) < len(data):
+            return packed, 1
+    return data, 0
+
+def unpack_blob(data, compressed, limit=0):
+    """
+    The note body stored by pack_blob. With `limit`, only enough is inflated for the first
+    `limit` characters, so previews of large pasted logs stay cheap.
+    """
+    if compressed:
+        data = zlib.decompressobj().decompress(data, limit * 4) if limit else zlib.decompress(data)
+    text = (data[:limit * 4] if limit else data).decode(errors='ignore' if limit else 'strict')
+    return text[:limit] if limit else text
+
+def load_notes(path=None):
+    """id -> note map for a JSON snapshot with any pending journal replayed on top."""
+    path = path or DB_FILE
+    notes = {int(n['id']): n for n in load_db(path)}
+    return replay_journal(notes, path + ".journal")
+
+
+# --- Full-Text Index ---
+TOKEN_RE = re.compile(r"\w+")
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+def note_terms(note):
+    """Term frequencies for a note. Tags are indexed as words and as whole '#tag' tokens."""
+    tf = {}
+    for token in tokenize(note.get('title', '')):
+        tf[token] = tf.get(token, 0) + TITLE_WEIGHT
+    for token in tokenize(note.get('content', '')):
+        tf[token] = tf.get(token, 0) + 1
+    for tag in note.get('tags', []):
+        for token in tokenize(tag) + ["#" + tag.lower()]:
+            tf[token] = tf.get(token, 0) + 1
+    return tf
+
+def parse_query(query, tag_only=False):
+    """
+    Splits a query into terms and phrases.
+    Each term is (text, is_prefix); `word*` is a prefix term and `"a b"` a phrase.
+    """
+    terms, phrases = [], []
+    for phrase, word in QUERY_RE.findall(query):
+        if tag_only:
+            text = (phrase or word).lower()
+            prefix = text.endswith('*')
+            terms.append(("#" + text.rstrip('*'), prefix))
+            continue
+        tokens = tokenize(phrase or word)
+        if not tokens:
+            continue
+        prefix = bool(word) and word.endswith('*')
+        terms.extend((t, prefix and i == len(tokens) - 1) for i, t in enumerate(tokens))
+        if len(tokens) > 1:
+            phrases.append(tokens)
+    return terms, phrases
+
+def trigrams(word):
+    """Character trigrams of a word, padded like pg_trgm so short words and word starts still count."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def contains_phrase(tokens, phrase):
+    n = len(phrase)
+    return any(tokens[i:i + n] == phrase for i in range(len(tokens) - n + 1))
+
+
+class SearchIndex:
+    """
+    Persistent inverted index (token -> note ids) kept in SQLite.
+    Each posting stores its BM25 term weight ("impact"), so a posting list can be read best-first
+    and a query stops as soon as no unread note could still make the top results.
+    Callers run add/remove inside their own transaction so the index never drifts from the notes.
+
+    A trigram table over the vocabulary (not the note text) backs fuzzy search: a misspelt word is
+    matched to the real tokens it resembles, and those then go through the posting lists as usual.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._expansions = {} # (text, prefix, fuzzy) -> tokens; reused between keystrokes, reset on writes
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS postings (
+                token   TEXT NOT NULL,
+                note_id INTEGER NOT NULL,
+                tf      INTEGER NOT NULL,
+                impact  REAL NOT NULL,
+                PRIMARY KEY (token, note_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_by_note ON postings(note_id);
+            CREATE INDEX IF NOT EXISTS postings_by_impact ON postings(token, impact DESC);
+            CREATE TABLE IF NOT EXISTS terms (
+                token      TEXT PRIMARY KEY,
+                df         INTEGER NOT NULL,
+                max_impact REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS doc_lengths (note_id INTEGER PRIMARY KEY, length INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS trigrams (
+                gram  TEXT NOT NULL,
+                n     INTEGER NOT NULL, -- trigram count of the token, for the length filter
+                token TEXT NOT NULL,
+                PRIMARY KEY (gram, n, token)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS kb_meta (key TEXT PRIMARY KEY, value) WITHOUT ROWID;
+        """)
+        if self.get_meta('trigrams') is None: # indexes built before fuzzy search existed
+            with self.conn:
+                self._add_trigrams([r[0] for r in self.conn.execute("SELECT token FROM terms")])
+                self.set_meta('trigrams', 1)
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM kb_meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO kb_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _add_trigrams(self, tokens):
+        rows = []
+        for token in tokens:
+            if not token.startswith('#'): # whole-tag tokens only serve tag searches
+                grams = trigrams(token)
+                rows.extend((gram, len(grams), token) for gram in grams)
+        self.conn.executemany("INSERT OR IGNORE INTO trigrams (gram, n, token) VALUES (?, ?, ?)", rows)
+
+    def _remove_trigrams(self, tokens):
+        rows = []
+        for token in tokens:
+            grams = trigrams(token)
+            rows.extend((gram, len(grams), token) for gram in grams)
+        self.conn.executemany("DELETE FROM trigrams WHERE gram = ? AND n = ? AND token = ?", rows)
+
+    def _existing_terms(self, tokens):
+        tokens, found = list(tokens), set()
+        for i in range(0, len(tokens), 500):
+            chunk = tokens[i:i + 500]
+            found.update(r[0] for r in self.conn.execute(
+                f"SELECT token FROM terms WHERE token IN ({', '.join('?' * len(chunk))})", chunk))
+        return found
+
+    def add_many(self, notes):
+        """
+        Indexes a batch of notes with one round of inserts.
+        Impacts use the average note length as of indexing time; `kb reindex` brings them up to date.
+        """
+        docs = [(note['id'], note_terms(note)) for note in notes]
+        lengths = [sum(tf.values()) for _, tf in docs]
+        n_docs = self.get_meta('docs', 0) + len(docs)
+        total_length = self.get_meta('total_length', 0) + sum(lengths)
+        self.set_meta('docs', n_docs)
+        self.set_meta('total_length', total_length)
+        avgdl = max(total_length / n_docs, 1) if n_docs else 1
+
+        postings, df, max_impact = [], {}, {}
+        for (note_id, tf), length in zip(docs, lengths):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl)
+            for token, count in tf.items():
+                impact = count * (BM25_K1 + 1) / (count + norm)
+                postings.append((token, note_id, count, impact))
+                df[token] = df.get(token, 0) + 1
+                max_impact[token] = max(impact, max_impact.get(token, 0))
+
+        existing = self._existing_terms(df)
+        self._add_trigrams(token for token in df if token not in existing)
+        self._expansions.clear()
+
+        postings.sort() # key order keeps B-tree inserts local on large batches
+        self.conn.executemany("INSERT INTO postings (token, note_id, tf, impact) VALUES (?, ?, ?, ?)", postings)
+        self.conn.executemany("""
+            INSERT INTO terms (token, df, max_impact) VALUES (?, ?, ?)
+            ON CONFLICT(token) DO UPDATE SET df = df + excluded.df, max_impact = MAX(max_impact, excluded.max_impact)
+        """, [(token, count, max_impact[token]) for token, count in df.items()])
+        self.conn.executemany("INSERT INTO doc_lengths (note_id, length) VALUES (?, ?)",
+                              [(note_id, length) for (note_id, _), length in zip(docs, lengths)])
+
+    def add(self, note):
+        self.add_many([note])
+
+    def remove(self, note_id):
+        row = self.conn.execute("SELECT length FROM doc_lengths WHERE note_id = ?", (note_id,)).fetchone()
+        if row is None:
+            return
+        tokens = [(r[0],) for r in self.conn.execute("SELECT token FROM postings WHERE note_id = ?", (note_id,))]
+        # max_impact is only ever an upper bound, so it is left as is
+        self.conn.executemany("UPDATE terms SET df = df - 1 WHERE token = ?", tokens)
+        self._remove_trigrams([r[0] for r in self.conn.execute(
+            "SELECT t.token FROM postings p JOIN terms t ON t.token = p.token WHERE p.note_id = ? AND t.df <= 0",
+            (note_id,))])
+        self.conn.executemany("DELETE FROM terms WHERE token = ? AND df <= 0", tokens)
+        self._expansions.clear()
+        self.conn.execute("DELETE FROM postings WHERE note_id = ?", (note_id,))
+        self.conn.execute("DELETE FROM doc_lengths WHERE note_id = ?", (note_id,))
+        self.set_meta('docs', self.get_meta('docs', 0) - 1)
+        self.set_meta('total_length', self.get_meta('total_length', 0) - row[0])
+
+    def update(self, note):
+        self.remove(note['id'])
+        self.add(note)
+
+    def rebuild(self, notes):
+        """Re-indexes everything as one batch, so every impact uses the final average length."""
+        self.conn.executescript("DELETE FROM postings; DELETE FROM terms; DELETE FROM doc_lengths; DELETE FROM trigrams;")
+        self.set_meta('docs', 0)
+        self.set_meta('total_length', 0)
+        self.add_many(list(notes))
+
+    def similar_tokens(self, word, threshold=FUZZY_THRESHOLD):
+        """
+        [(token, similarity)] for vocabulary words whose trigram (Jaccard) similarity to `word`
+        reaches `threshold`, best first. Tokens too short or too long to qualify are skipped by the index.
+        """
+        grams = trigrams(word)
+        q = len(grams)
+        lo, hi = math.ceil(q * threshold), math.floor(q / threshold)
+        rows = self.conn.execute(
+            f"SELECT token, n, COUNT(*) FROM trigrams WHERE gram IN ({', '.join('?' * q)}) "
+            f"AND n BETWEEN ? AND ? GROUP BY token", list(grams) + [lo, hi])
+        similar = [(token, common / (q + n - common)) for token, n, common in rows]
+        similar = [(token, sim) for token, sim in similar if sim >= threshold]
+        return sorted(similar, key=lambda t: -t[1])[:MAX_PREFIX_TERMS]
+
+    def _expand(self, text, prefix, fuzzy=None):
+        """
+        Returns [(token, df, max_impact, weight)] for a term. Prefix terms expand over the sorted
+        `terms` table; with `fuzzy`, other terms expand to similar tokens weighted by similarity.
+        """
+        key = (text, prefix, fuzzy)
+        if key in self._expansions:
+            return self._expansions[key]
+        if prefix:
+            expanded = [tuple(r) + (1.0,) for r in self.conn.execute(
+                "SELECT token, df, max_impact FROM terms WHERE token >= ? AND token < ? ORDER BY df DESC LIMIT ?",
+                (text, text + "\U0010ffff", MAX_PREFIX_TERMS))]
+        elif fuzzy and not text.startswith('#'):
+            weights = dict(self.similar_tokens(text, fuzzy))
+            weights.setdefault(text, 1.0) # an exact match is always welcome
+            expanded = [(token, df, mi, weights[token])
+                        for token, df, mi in self.conn.execute(
+                            f"SELECT token, df, max_impact FROM terms WHERE token IN ({', '.join('?' * len(weights))})",
+                            list(weights))]
+        else:
+            row = self.conn.execute("SELECT token, df, max_impact FROM terms WHERE token = ?", (text,)).fetchone()
+            expanded = [tuple(row) + (1.0,)] if row else []
+        self._expansions[key] = expanded
+        return expanded
+
+    def _postings(self, token, idf):
+        """Streams (note_id, weight) for one token, highest weight first."""
+        cur = self.conn.execute("SELECT note_id, impact FROM postings INDEXED BY postings_by_impact "
+                                "WHERE token = ? ORDER BY impact DESC", (token,))
+        for note_id, impact in cur:
+            yield note_id, idf * impact
+
+    def search(self, terms, limit=None, accept=None, fuzzy=None):
+        """
+        Returns [(note_id, score)] for notes matching every term, best BM25 score first.
+        The term able to contribute the most drives the search best-first; the other terms are
+        probed per candidate, and `accept` (when given) can reject a candidate before it takes a slot.
+        With `fuzzy` (a similarity threshold), non-prefix terms also match similar words.
+        """
+        docs = self.get_meta('docs', 0)
+        if not docs or not terms:
+            return []
+
+        expanded = [] # per term: {token: (idf, max_impact, df)}
+        for text, prefix in terms:
+            tokens = self._expand(text, prefix, fuzzy)
+            if not tokens:
+                return [] # an unmatched term can't be satisfied
+            expanded.append({token: (weight * math.log(1 + (docs - df + 0.5) / (df + 0.5)), max_impact, df)
+                             for token, df, max_impact, weight in tokens})
+
+        bounds = [max(idf * mi for idf, mi, _ in e.values()) for e in expanded]
+        driver = max(range(len(expanded)), key=lambda t: (bounds[t], -sum(v[2] for v in expanded[t].values())))
+        others = [e for t, e in enumerate(expanded) if t != driver]
+        others_bound = sum(bounds) - bounds[driver]
+        other_tokens = [token for e in others for token in e]
+        probe = (f"SELECT token, impact FROM postings WHERE note_id = ? "
+                 f"AND token IN ({', '.join('?' * len(other_tokens))})")
+        streams = [self._postings(token, idf) for token, (idf, _, _) in expanded[driver].items()]
+
+        top, seen = [], set() # `top` is a min-heap of (score, -note_id)
+        for note_id, weight in heapq.merge(*streams, key=lambda p: -p[1]):
+            if limit and len(top) >= limit and weight + others_bound <= top[0][0]:
+                break # nothing further down the posting lists can beat the current results
+            if note_id in seen:
+                continue
+            seen.add(note_id) # first sighting carries the note's best driver weight
+
+            score = weight
+            if others:
+                impacts = dict(self.conn.execute(probe, [note_id] + other_tokens))
+                best = [max((idf * impacts[token] for token, (idf, _, _) in e.items() if token in impacts),
+                            default=None) for e in others]
+                if None in best:
+                    continue
+                score += sum(best)
+            if accept and not accept(note_id):
+                continue
+            if limit and len(top) >= limit:
+                heapq.heappushpop(top, (score, -note_id))
+            else:
+                heapq.heappush(top, (score, -note_id))
+
+        return [(-neg_id, score) for score, neg_id in sorted(top, reverse=True)]
+
+
+# --- Tag Index ---
+TAG_EXPR_RE = re.compile(r"\(|\)|[^\s()]+")
+
+class TagIndex:
+    """
+    Tag -> note ids, read from the '#tag' posting lists the search index already maintains.
+    Postings are keyed by (token, note_id), so each tag's ids come back as a sorted int array.
+    """
+
+    def __init__(self, index):
+        self.conn = index.conn
+
+    def ids(self, tag):
+        tag = "#" + tag.lower()
+        if tag.endswith('*'):
+            tag = tag.rstrip('*')
+            rows = self.conn.execute("SELECT note_id FROM postings WHERE token >= ? AND token < ?",
+                                     (tag, tag + "\U0010ffff"))
+        else:
+            rows = self.conn.execute("SELECT note_id FROM postings WHERE token = ?", (tag,))
+        return {r[0] for r in rows}
+
+    def all_ids(self):
+        return {r[0] for r in self.conn.execute("SELECT note_id FROM doc_lengths")}
+
+    def counts(self):
+        """[(tag, count)] most used first, straight from the document frequencies; no note is read."""
+        return [(token[1:], df) for token, df in self.conn.execute(
+            "SELECT token, df FROM terms WHERE token >= '#' AND token < '$' ORDER BY df DESC, token")]
+
+
+def parse_tag_expr(expr):
+    """
+    Parses 'python and not (deprecated or old)' into nested tuples.
+    Precedence is not > and > or; tags next to each other are and-ed.
+    """
+    tokens = TAG_EXPR_RE.findall(expr)
+    pos = 0
+
+    def peek():
+        return tokens[pos].lower() if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == 'or':
+            take()
+            node = ('or', node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while peek() not in (None, 'or', ')'):
+            if peek() == 'and':
+                take()
+            node = ('and', node, parse_not())
+        return node
+
+    def parse_not():
+        if peek() == 'not':
+            take()
+            return ('not', parse_not())
+        if peek() == '(':
+            take()
+            node = parse_or()
+            if peek() != ')':
+                raise ValueError("missing ')'")
+            take()
+            return node
+        if peek() in (None, 'and', 'or', ')'):
+            raise ValueError(f"expected a tag at '{' '.join(tokens[pos:]) or 'end of expression'}'")
+        return ('tag', take())
+
+    node = parse_or()
+    if pos != len(tokens):
+        raise ValueError(f"unexpected '{tokens[pos]}'")
+    return node
+
+def eval_tag_expr(node, tags):
+    """
+    Evaluates a parsed expression to a set of note ids by intersection, union and difference.
+    Negations are carried as (ids, negated) so 'a and not b' is a - b; the complete id set
+    is only materialised when the whole expression is negative.
+    """
+
+    def walk(node):
+        op = node[0]
+        if op == 'tag':
+            return tags.ids(node[1]), False
+        if op == 'not':
+            ids, negated = walk(node[1])
+            return ids, not negated
+        (a, neg_a), (b, neg_b) = walk(node[1]), walk(node[2])
+        if op == 'and':
+            if not neg_a and not neg_b:
+                return a & b, False
+            if neg_a and neg_b:
+                return a | b, True
+            return (b - a, False) if neg_a else (a - b, False)
+        if not neg_a and not neg_b:
+            return a | b, False
+        if neg_a and neg_b:
+            return a & b, True
+        return (a - b, True) if neg_a else (b - a, True)
+
+    ids, negated = walk(node)
+    return tags.all_ids() - ids if negated else ids
+
+
+class JsonBackend:
+    """
+    Original storage: the whole KB is one JSON list, rewritten on every change.
+    In memory the notes are an id -> note map, and the next id comes from a counter in the sidecar.
+    """
+    name = "json"
+    append_only = False # whether writes can skip loading the snapshot
+
+    def __init__(self, path=None, index_path=None):
+        self.path = path or DB_FILE
+        self.journal_path = self.path + ".journal"
+        self.index_path = index_path or (INDEX_FILE if path is None else path + ".idx")
+        self._notes = None
+        self._lock = threading.Lock() # serialises writers with background compaction
+        self.index_conn = sqlite3.connect(self.index_path)
+        self.index = SearchIndex(self.index_conn)
+        self.tags = TagIndex(self.index)
+        # The JSON file can be edited by hand, so the sidecar index remembers which version it covers
+        # (checked under the journal lock, so another kb process's half-finished write doesn't look like an edit)
+        with self._journal_lock():
+            if self.index.get_meta('source') != self._signature():
+                with self.index_conn:
+                    notes = self._load()
+                    self.index.rebuild(notes.values())
+                    self.index.set_meta('next_id', max([self.index.get_meta('next_id', 1)] + [i + 1 for i in notes]))
+                    self._stamp()
+
+    def _signature(self):
+        parts = []
+        for path in (self.path, self.journal_path):
+            try:
+                st = os.stat(path)
+                parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+            except FileNotFoundError:
+                parts.append("missing")
+        return "/".join(parts)
+
+    def _stamp(self):
+        self.index.set_meta('source', self._signature())
+
+    def _journal_lock(self):
+        """
+        Opens and flocks the journal's lock file, so kb processes (e.g. `kb import` next to
+        `kb add`) take turns writing and compacting; closing it releases the lock. The lock lives
+        in its own file because compaction replaces the journal itself.
+        """
+        f = open(self.journal_path + ".lock", 'a')
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    def _files_identity(self):
+        """Which snapshot and journal files are in place; compaction in any process changes it."""
+        identity = []
+        for path in (self.path, self.journal_path):
+            try:
+                st = os.stat(path)
+                identity.append((st.st_ino, st.st_mtime_ns) if path == self.path else st.st_ino)
+            except FileNotFoundError:
+                identity.append(None)
+        return identity
+
+    def _load(self):
+        if self._notes is None:
+            self._notes = load_notes(self.path)
+        return self._notes
+
+    def _allocate_id(self, note):
+        next_id = self.index.get_meta('next_id', 1)
+        if not note.get('id'):
+            note['id'] = next_id
+        self.index.set_meta('next_id', max(next_id, note['id'] + 1))
+
+    def _write(self, changes):
+        """Persists the map after `changes`: the whole snapshot is rewritten, absorbing any journal."""
+        save_db(list(self._load().values()), self.path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def _after_write(self):
+        pass
+
+    def _commit(self, changes):
+        """
+        Applies [(op, note)] changes ('add', 'edit' or 'delete') to the map, persists them,
+        and updates the search index and id counter in the same sidecar transaction.
+        """
+        with self._lock, self._journal_lock(), self.index_conn:
+            adds = [note for op, note in changes if op == 'add']
+            for note in adds:
+                self._allocate_id(note)
+            if self._notes is not None or not self.append_only:
+                db = self._load()
+                for op, note in changes:
+                    if op == 'delete':
+                        db.pop(note['id'], None)
+                    else:
+                        db[note['id']] = note
+            self._write(changes)
+
+            self.index.add_many(adds)
+            for op, note in changes:
+                if op == 'edit':
+                    self.index.update(note)
+                elif op == 'delete':
+                    self.index.remove(note['id'])
+            self._stamp()
+        self._after_write()
+
+    def all(self):
+        return list(self._load().values())
+
+    def get(self, note_id):
+        return self._load().get(note_id)
+
+    def content_hash(self, note_id):
+        note = self.get(note_id)
+        return None if note is None else content_hash(note.get('content'))
+
+    def iter_notes(self, ids=None, preview=0, full=False):
+        """
+        Streams listing fields (see project_note) in id order for `ids`, or in file order for everything;
+        `full` streams whole notes instead.
+        Unless the map is already loaded, the snapshot is parsed record by record and the
+        (size-bounded) journal is layered on top.
+        """
+        wanted = None if ids is None else set(ids)
+        if self._notes is not None and wanted is not None:
+            yield from (project_note(self._notes[i], preview, full) for i in sorted(wanted) if i in self._notes)
+            return
+        if self._notes is not None:
+            source = self._notes.values()
+        else:
+            changes = journal_changes(self.journal_path)
+            source = itertools.chain((n for n in iter_json_list(self.path) if int(n['id']) not in changes),
+                                     (n for n in changes.values() if n is not None))
+        listed = (project_note(n, preview, full) for n in source if wanted is None or int(n['id']) in wanted)
+        yield from (listed if wanted is None else sorted(listed, key=lambda n: n['id']))
+
+    def add(self, note):
+        self._commit([('add', note)])
+        return note['id']
+
+    def update(self, note):
+        self._commit([('edit', note)])
+
+    def delete(self, note_id):
+        self._commit([('delete', {'id': note_id})])
+
+    def add_many(self, notes):
+        self._commit([('add', note) for note in notes])
+
+    def count(self):
+        return self.index.get_meta('docs', 0) # the sidecar is in sync (see _signature), so no need to load the file
+
+    def close(self):
+        self.index_conn.close()
+
+
+class JournalBackend(JsonBackend):
+    """
+    Write-ahead journal over the JSON snapshot. Every change appends one fsync'd line
+    to ~/.kb_data.json.journal, and readers replay the journal on top of the snapshot.
+    Past JOURNAL_COMPACT_BYTES a background thread folds the journal into a new snapshot.
+    """
+    name = "journal"
+    append_only = True
+
+    def __init__(self, path=None, index_path=None):
+        self._compactor = None
+        self._checked_tail = False
+        super().__init__(path, index_path)
+
+    def _repair_tail(self):
+        """Cuts a torn last record (crash mid-append) so new records start on a fresh line."""
+        if self._checked_tail or not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+        self._checked_tail = True
+
+    def _write(self, changes):
+        lines = []
+        for op, note in changes:
+            record = {"op": op, "id": note['id']}
+            if op != 'delete':
+                record["note"] = note
+            lines.append(json.dumps(record, separators=(',', ':')) + "\n")
+        # _commit holds the journal lock, so this never appends to a journal another process just replaced
+        self._repair_tail()
+        with open(self.journal_path, 'a') as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _after_write(self):
+        if os.path.getsize(self.journal_path) > JOURNAL_COMPACT_BYTES:
+            self.compact(wait=False)
+
+    def compact(self, wait=True):
+        """Folds the journal as it is now into a new snapshot, in a background thread unless `wait`."""
+        if self._compactor and self._compactor.is_alive():
+            if wait:
+                self._compactor.join()
+            return
+        with self._lock, self._journal_lock():
+            self._repair_tail()
+            offset = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+            identity = self._files_identity()
+        if not offset:
+            return
+        self._compactor = threading.Thread(target=self._compact, args=(offset, identity), name="kb-compact")
+        self._compactor.start() # not a daemon: a CLI run waits for it before exiting
+        if wait:
+            self._compactor.join()
+
+    def _compact(self, offset, identity):
+        """
+        Writes snapshot + journal[:offset] to a temp file, then, holding the writer locks (thread and
+        flock), renames it over the snapshot and keeps only the records appended since. A crash between
+        the two steps just replays already-folded records, which is harmless. If another process
+        compacted in the meantime, `offset` no longer means anything and the result is dropped.
+        """
+        notes = replay_journal({int(n['id']): n for n in load_db(self.path)}, self.journal_path, offset)
+        tmp = self.path + ".compact.%d" % os.getpid()
+        _write_synced(list(notes.values()), tmp)
+
+        with self._lock, self._journal_lock():
+            if self._files_identity() != identity:
+                os.remove(tmp)
+                return
+            before = self._signature()
+            os.replace(tmp, self.path)
+            with open(self.journal_path, 'rb') as f:
+                f.seek(offset)
+                tail = f.read()
+            if tail:
+                with open(self.journal_path + ".tmp", 'wb') as f:
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(self.journal_path + ".tmp", self.journal_path)
+            else:
+                os.remove(self.journal_path)
+            _fsync_dir(self.path)
+
+            # The notes didn't change, so move the sidecar's stamp along (this thread needs its own connection)
+            conn = sqlite3.connect(self.index_path)
+            with conn:
+                conn.execute("UPDATE kb_meta SET value = ? WHERE key = 'source' AND value = ?",
+                             (self._signature(), before))
+            conn.close()
+
+    def close(self):
+        if self._compactor:
+            self._compactor.join()
+        super().close()
+
+
+class SqliteBackend:
+    """
+    Row-level storage in SQLite (WAL mode); `id` is the table's rowid, so lookups are indexed.
+    Note bodies live in a content-addressed blob table (sha256 -> zlib-compressed body, reference
+    counted), so a log pasted into many notes is stored once and a note row keeps only the hash.
+    The search index shares the connection and is updated in the same transaction as each note.
+    """
+    name = "sqlite"
+    compress = True # zlib-compress bodies in the blob store (bench turns it off for comparison)
+    SELECT_FULL = ("SELECT notes.id, title, tags, date, data, compressed "
+                   "FROM notes JOIN blobs ON blobs.hash = notes.content_hash")
+
+    def __init__(self, path=None):
+        self.path = path or SQLITE_FILE
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS notes (
+                id           INTEGER PRIMARY KEY,
+                title        TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                tags         TEXT NOT NULL DEFAULT '[]',
+                date         TEXT NOT NULL
+            )""")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash       TEXT PRIMARY KEY,
+                data       BLOB NOT NULL,
+                compressed INTEGER NOT NULL,
+                size       INTEGER NOT NULL,
+                refs       INTEGER NOT NULL
+            )""")
+        columns = [r[1] for r in self.conn.execute("PRAGMA table_info(notes)")]
+        if 'content' in columns: # databases that kept bodies inline
+            self._move_content_to_blobs('content_hash' in columns)
+        self.index = SearchIndex(self.conn)
+        self.tags = TagIndex(self.index)
+        if self.index.get_meta('docs') is None: # databases created before the index existed
+            self.index.rebuild(self.all())
+        if self.index.get_meta('next_id') is None:
+            self.index.set_meta('next_id', self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM notes").fetchone()[0])
+        self.conn.commit()
+
+    def _move_content_to_blobs(self, has_hash):
+        with self.conn:
+            if not has_hash:
+                self.conn.execute("ALTER TABLE notes ADD COLUMN content_hash TEXT NOT NULL DEFAULT ''")
+            rows = self.conn.execute("SELECT id, content FROM notes").fetchall()
+            self.conn.executemany("UPDATE notes SET content_hash = ? WHERE id = ?",
+                                  [(self._store_blob(content), note_id) for note_id, content in rows])
+            self.conn.execute("ALTER TABLE notes DROP COLUMN content")
+
+    def _store_blob(self, content):
+        """Takes a reference on the blob for `content`, writing it only if it is new. Returns its hash."""
+        digest = content_hash(content)
+        if not self.conn.execute("UPDATE blobs SET refs = refs + 1 WHERE hash = ?", (digest,)).rowcount:
+            data, compressed = pack_blob(content, self.compress)
+            self.conn.execute("INSERT INTO blobs (hash, data, compressed, size, refs) VALUES (?, ?, ?, ?, 1)",
+                              (digest, data, compressed, len((content or "").encode())))
+        return digest
+
+    def _release_blob(self, digest):
+        self.conn.execute("UPDATE blobs SET refs = refs - 1 WHERE hash = ?", (digest,))
+        self.conn.execute("DELETE FROM blobs WHERE hash = ? AND refs <= 0", (digest,))
+
+    @staticmethod
+    def _to_note(row, preview=0):
+        if row is None:
+            return None
+        note = {'id': row['id'], 'title': row['title']}
+        if 'data' in row.keys():
+            if preview:
+                note['preview'] = unpack_blob(row['data'], row['compressed'], preview)
+            else:
+                note['content'] = unpack_blob(row['data'], row['compressed'])
+        note['tags'] = json.loads(row['tags'])
+        note['date'] = row['date']
+        return note
+
+    @staticmethod
+    def _to_row(note):
+        return (note.get('id'), note['title'], json.dumps(note.get('tags') or []), note['date'])
+
+    def all(self):
+        return [self._to_note(r) for r in self.conn.execute(f"{self.SELECT_FULL} ORDER BY notes.id")]
+
+    def get(self, note_id):
+        return self._to_note(self.conn.execute(f"{self.SELECT_FULL} WHERE notes.id = ?", (note_id,)).fetchone())
+
+    def content_hash(self, note_id):
+        row = self.conn.execute("SELECT content_hash FROM notes WHERE id = ?", (note_id,)).fetchone()
+        return row and row[0]
+
+    def iter_notes(self, ids=None, preview=0, full=False):
+        """
+        Streams listing fields (see project_note) in id order, row by row off the cursor.
+        Blobs are only joined in when a `preview` is asked for, and then only its first
+        characters are inflated; `full` streams whole notes instead.
+        """
+        query = self.SELECT_FULL if full or preview else "SELECT id, title, tags, date FROM notes"
+        to_note = lambda row: self._to_note(row, 0 if full else preview)
+        if ids is None:
+            yield from map(to_note, self.conn.execute(f"{query} ORDER BY notes.id"))
+            return
+        ids = sorted(ids)
+        for i in range(0, len(ids), 500): # fetched by primary key, a chunk at a time
+            chunk = ids[i:i + 500]
+            yield from map(to_note, self.conn.execute(
+                f"{query} WHERE notes.id IN ({', '.join('?' * len(chunk))}) ORDER BY notes.id", chunk))
+
+    def _begin_write(self):
+        """
+        Takes SQLite's write lock up front (BEGIN IMMEDIATE), so reading the id counter and bumping
+        it can't interleave with another kb process doing the same.
+        """
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+
+    def _insert(self, note):
+        # Ids come from a persisted high-water mark, so a deleted note's id is never handed out again
+        next_id = self.index.get_meta('next_id')
+        if not note.get('id'):
+            note['id'] = next_id
+        digest = self._store_blob(note.get('content'))
+        self.conn.execute("INSERT INTO notes (id, title, tags, date, content_hash) VALUES (?, ?, ?, ?, ?)",
+                          self._to_row(note) + (digest,))
+        self.index.set_meta('next_id', max(next_id, note['id'] + 1))
+
+    def add(self, note):
+        with self.conn:
+            self._begin_write()
+            self._insert(note)
+            self.index.add(note)
+        return note['id']
+
+    def update(self, note):
+        with self.conn:
+            old = self.content_hash(note['id'])
+            digest = content_hash(note.get('content'))
+            if digest != old: # a retitle or retag leaves the blob alone
+                self._store_blob(note.get('content'))
+                self._release_blob(old)
+            self.conn.execute("UPDATE notes SET title = ?, tags = ?, date = ?, content_hash = ? WHERE id = ?",
+                              self._to_row(note)[1:] + (digest, note['id']))
+            self.index.update(note)
+
+    def delete(self, note_id):
+        with self.conn:
+            digest = self.content_hash(note_id)
+            self.conn.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+            if digest:
+                self._release_blob(digest)
+            self.index.remove(note_id)
+
+    def add_many(self, notes):
+        with self.conn:
+            self._begin_write()
+            for note in notes:
+                self._insert(note)
+            self.index.add_many(notes)
+
+    def count(self):
+        return self.index.get_meta('docs', 0)
+
+    def close(self):
+        self.conn.close()
+
+
+BACKENDS = {"json": JsonBackend, "journal": JournalBackend, "sqlite": SqliteBackend}
+
+def migrate_json(backend, json_path=None):
+    """One-shot copy of the legacy JSON list into `backend`. Returns the number of notes copied."""
+    notes = list(load_notes(json_path).values())
+    backend.add_many(notes)
+    return len(notes)
+
+def open_db(name=None):
+    """Opens the configured storage backend, migrating the JSON file into a brand-new SQLite DB."""
+    name = name or STORAGE_BACKEND
+    if name not in BACKENDS:
+        print(f"{RED}Error: Unknown storage backend '{name}' (choose from {', '.join(BACKENDS)}).{RESET}")
+        sys.exit(1)
+
+    fresh = name == "sqlite" and not os.path.exists(SQLITE_FILE)
+    db = BACKENDS[name]()
+    if fresh and os.path.exists(DB_FILE):
+        copied = migrate_json(db)
+        print(f"{CYAN}Migrated {copied} notes from {DB_FILE} to {SQLITE_FILE}.{RESET}", file=sys.stderr)
+    return db
 
 # --- Helper: Print Note ---
 def print_note(note, full_content=False):
@@ -49,22 +1047,23 @@ def print_note(note, full_content=False):
     if note.get('tags'):
         print(f"{YELLOW}Tags: {', '.join(note['tags'])}{RESET}")
     
-    # Display full content for view command or search
-    if note.get('content'):
+    # Display full content for view command; list/search pass a streamed note with only a `preview`
+    body = note.get('content') if full_content else note.get('preview', note.get('content'))
+    if body:
         print(f"\n{BOLD}CONTENT:{RESET}")
         if full_content:
-            print(note['content'])
+            print(body)
         else:
              # Truncate content for search/list preview
-            content_preview = note['content'][:150] + '...' if len(note['content']) > 150 else note['content']
+            content_preview = body[:PREVIEW_CHARS] + '...' if len(body) > PREVIEW_CHARS else body
             print(content_preview)
     print("-" * 50)
 
 
 # --- New Command: View ---
 def view_note(args):
-    db = load_db()
-    note = next((n for n in db if n['id'] == args.id), None)
+    db = open_db(args.backend)
+    note = db.get(args.id)
     
     if note:
         print_note(note, full_content=True)
@@ -73,13 +1072,11 @@ def view_note(args):
 
 # --- New Command: Edit ---
 def edit_note(args):
-    db = load_db()
+    db = open_db(args.backend)
     
     # 1. Find the note
-    try:
-        index = next(i for i, n in enumerate(db) if n['id'] == args.id)
-        note = db[index]
-    except StopIteration:
+    note = db.get(args.id)
+    if note is None:
         print(f"{RED}Error: Note with ID {args.id} not found.{RESET}")
         return
 
@@ -102,11 +1099,11 @@ def edit_note(args):
     with open(tmp_path, 'r') as tmp:
         modified_content = tmp.read()
 
-    # 5. Update the database
-    if modified_content != note['content']:
+    # 5. Update the database (bodies are content-addressed, so comparing hashes is enough)
+    if content_hash(modified_content) != db.content_hash(args.id):
         note['content'] = modified_content
         note['date'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S") # Update timestamp
-        save_db(db)
+        db.update(note)
         print(f"✅ {GREEN}Note ID {args.id} updated successfully.{RESET}")
     else:
         print("Note content unchanged.")
@@ -117,12 +1114,11 @@ def edit_note(args):
 
 # --- Command: Delete ---
 def delete_note(args):
-    db = load_db()
+    db = open_db(args.backend)
 
     # 1. Find the note
-    try:
-        note = next(n for n in db if n['id'] == args.id)
-    except StopIteration:
+    note = db.get(args.id)
+    if note is None:
         print(f"{RED}Error: Note with ID {args.id} not found.{RESET}")
         return
 
@@ -133,9 +1129,8 @@ def delete_note(args):
     confirm = input("Type 'yes' to confirm: ")
 
     if confirm.lower() == 'yes':
-        # 3. Filter the note out of the list
-        new_db = [n for n in db if n['id'] != args.id]
-        save_db(new_db)
+        # 3. Remove the note from storage
+        db.delete(args.id)
         print(f"✅ {GREEN}Note ID {args.id} and content successfully DELETED.{RESET}")
     else:
         print(f"{CYAN}Deletion cancelled.{RESET}")
@@ -143,37 +1138,34 @@ def delete_note(args):
 
 # --- Existing Commands (Condensed) ---
 def add_note(args):
-    db = load_db()
-    new_id = 1 if not db else max(n.get('id', 0) for n in db) + 1 # Robust ID generation
+    db = open_db(args.backend)
     
     new_note = {
-        "id": new_id,
         "title": args.title,
         "content": args.content, 
         "tags": args.tags,       
         "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
     
-    db.append(new_note)
-    save_db(db)
+    new_id = db.add(new_note)
     print(f"✅ {GREEN}Note added! [ID: {new_id}]{RESET}")
 
 def list_notes(args):
-    db = load_db()
-    
-    # 1. Start with the full database
-    filtered_db = db
+    db = open_db(args.backend)
     
-    # 2. Apply filtering if a tag is provided
-    if args.tag:
-        tag_query = args.tag.lower()
-        # Filter notes where the tag_query is present in the note's tags list
-        filtered_db = [
-            note for note in db
-            if tag_query in [t.lower() for t in note.get('tags', [])]
-        ]
+    # 1. Without a tag expression, list the full database
+    if not args.tag:
+        ids, total = None, db.count()
+    else:
+        # 2. Resolve the expression on the tag index; only the matching notes are read
+        try:
+            ids = eval_tag_expr(parse_tag_expr(args.tag), db.tags)
+        except ValueError as e:
+            print(f"{RED}Error: Invalid tag expression '{args.tag}': {e}.{RESET}")
+            return
+        total = len(ids)
         
-    if not filtered_db:
+    if not total:
         if args.tag:
             print(f"{RED}No notes found with tag '{args.tag}'.{RESET}")
         else:
@@ -182,62 +1174,415 @@ def list_notes(args):
     
     # 3. Print the results
     tag_info = f" (Tag: {args.tag})" if args.tag else ""
-    print(f"\n{BOLD}{CYAN}--- Notes Found ({len(filtered_db)}){tag_info} ---{RESET}")
-    for note in filtered_db:
+    print(f"\n{BOLD}{CYAN}--- Notes Found ({total}){tag_info} ---{RESET}")
+    # Notes are streamed one at a time with listing fields only; content is never loaded here
+    for note in db.iter_notes(ids):
         # Display note information cleanly
         tags_str = f" ({', '.join(note.get('tags', []))})" if note.get('tags') else ""
         print(f"[{note['id']}] {note['title']} {YELLOW}{tags_str}{RESET}")
 
-    
-    print(f"\n{BOLD}{CYAN}--- All Notes ({len(db)}) ---{RESET}")
-    for note in db:
-        print(f"[{note['id']}] {note['title']} {YELLOW}({', '.join(note.get('tags', []))}){RESET}")
+def tag_counts(backend=None):
+    """[(tag, count)] for every tag in the KB, read from the tag index without scanning notes."""
+    return open_db(backend).tags.counts()
+
+def list_tags(args):
+    counts = tag_counts(args.backend)
+    if not counts:
+        print("No tags found.")
+        return
+    print(f"\n{BOLD}{CYAN}--- Tags ({len(counts)}) ---{RESET}")
+    for tag, count in counts:
+        print(f"{YELLOW}{tag:<24}{RESET} {count}")
+
+def ranked_search(db, query, tag_only=False, limit=None, fuzzy=None, last_prefix=False):
+    """
+    Returns up to `limit` (note, score) pairs, best match first. Phrases are verified on candidates only.
+    `fuzzy` is a trigram similarity threshold; `last_prefix` treats a half-typed last word as a prefix.
+    """
+    terms, phrases = parse_query(query, tag_only)
+    if last_prefix and terms and query[-1:].isalnum():
+        terms[-1] = (terms[-1][0], True)
+
+    def has_phrases(note_id):
+        note = db.get(note_id)
+        fields = [tokenize(note.get('title', '')), tokenize(note.get('content', '')),
+                  tokenize(" ".join(note.get('tags', [])))]
+        return all(any(contains_phrase(f, phrase) for f in fields) for phrase in phrases)
+
+    hits = db.index.search(terms, limit=limit, accept=has_phrases if phrases else None, fuzzy=fuzzy)
+    previews = {n['id']: n for n in db.iter_notes([note_id for note_id, _ in hits], preview=PREVIEW_CHARS + 1)}
+    return [(previews[note_id], score) for note_id, score in hits if note_id in previews]
+
+def _read_key(fd):
+    """One keystroke from a cbreak-mode terminal; arrow keys come back as 'UP'/'DOWN'."""
+    key = os.read(fd, 1)
+    if key == b"\x1b":
+        if not select.select([fd], [], [], 0.05)[0]:
+            return "ESC"
+        seq = os.read(fd, 2)
+        return {b"[A": "UP", b"[B": "DOWN"}.get(seq, "")
+    return key.decode(errors='ignore')
+
+def interactive_search(db, args):
+    """
+    Incremental search: results refresh on every keystroke. The index stays open and term
+    expansions are cached, so each keystroke only looks up the word being typed.
+    Up/Down pick a result, Enter views it, Esc quits. Without a terminal, each input line is one query.
+    """
+    fuzzy = args.threshold
+    if not sys.stdin.isatty():
+        for line in sys.stdin:
+            for note, score in ranked_search(db, line.strip(), limit=args.limit, fuzzy=fuzzy):
+                print(f"[{note['id']}] {note['title']} {YELLOW}({score:.2f}){RESET}")
+            print("-" * 50)
+        return
+
+    fd = sys.stdin.fileno()
+    saved = termios.tcgetattr(fd)
+    query, selected, results = args.query or "", 0, []
+    try:
+        tty.setcbreak(fd)
+        while True:
+            start = time.perf_counter()
+            results = ranked_search(db, query, limit=args.limit, fuzzy=fuzzy, last_prefix=True) if query.strip() else []
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            selected = min(selected, max(len(results) - 1, 0))
+
+            lines = [f"{BOLD}{CYAN}kb>{RESET} {query}", ""]
+            for i, (note, score) in enumerate(results):
+                marker = f"{GREEN}>{RESET}" if i == selected else " "
+                tags_str = f" ({', '.join(note.get('tags') or [])})" if note.get('tags') else ""
+                lines.append(f"{marker} [{note['id']}] {note['title']}{YELLOW}{tags_str}{RESET}")
+            lines += ["", f"{CYAN}{len(results)} results in {elapsed_ms:.1f} ms · ↑/↓ select · Enter view · Esc quit{RESET}"]
+            sys.stdout.write("\033[H\033[J" + "\n".join(lines))
+            sys.stdout.write(f"\033[1;{5 + len(query)}H") # park the cursor after the query
+            sys.stdout.flush()
+
+            key = _read_key(fd)
+            if key in ("ESC", "\x04"):
+                break
+            if key in ("\n", "\r"):
+                if results:
+                    sys.stdout.write("\033[H\033[J")
+                    print_note(db.get(results[selected][0]['id']), full_content=True)
+                break
+            if key == "UP":
+                selected = max(selected - 1, 0)
+            elif key == "DOWN":
+                selected += 1
+            elif key in ("\x7f", "\x08"):
+                query = query[:-1]
+            elif key.isprintable():
+                query += key
+    except KeyboardInterrupt:
+        pass
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+        print()
 
 def search_notes(args):
-    db = load_db()
-    query = args.query.lower()
-    found = False
-    
-    # Check if we should only search tags
-    tag_only_mode = args.tag_only
+    db = open_db(args.backend)
+    if args.interactive:
+        interactive_search(db, args)
+        return
+    if not args.query:
+        print(f"{RED}Error: a search query is required (or use --interactive).{RESET}")
+        return
     
-    print(f"\n{BOLD}{CYAN}--- Search Results for '{query}' ---{RESET}")
+    # Tag-only mode matches whole tags ('py*' for a prefix) instead of words in title and content
+    start = time.perf_counter()
+    results = ranked_search(db, args.query, tag_only=args.tag_only, limit=args.limit,
+                            fuzzy=args.threshold if args.fuzzy else None)
+    elapsed_ms = (time.perf_counter() - start) * 1000
     
-    for note in db:
-        # Check for tag match regardless of mode
-        in_tags = any(query in tag.lower() for tag in note.get('tags', []))
-        
-        if tag_only_mode:
-            # Mode 1: Only check tags
-            if in_tags:
-                print_note(note, full_content=False)
-                found = True
-        else:
-            # Mode 2: Check all fields (standard search)
-            in_title = query in note.get('title', '').lower()
-            in_content = query in note.get('content', '').lower()
-            
-            if in_title or in_content or in_tags:
-                print_note(note, full_content=False)
-                found = True
+    print(f"\n{BOLD}{CYAN}--- Search Results for '{args.query}' ({len(results)} in {elapsed_ms:.1f} ms) ---{RESET}")
+    for note, score in results:
+        print_note(note, full_content=False)
             
-    if not found:
+    if not results:
         print(f"{RED}No matches found.{RESET}")
 
-    
-    print(f"\n{BOLD}{CYAN}--- Search Results for '{query}' ---{RESET}")
-    for note in db:
-        # Search logic remains the same
-        in_title = query in note.get('title', '').lower()
-        in_content = query in note.get('content', '').lower()
-        in_tags = any(query in tag.lower() for tag in note.get('tags', []))
-        
-        if in_title or in_content or in_tags:
-            print_note(note, full_content=False)
-            found = True
-            
-    if not found:
-        print(f"{RED}No matches found.{RESET}")
+
+# --- Command: Import / Export ---
+MD_HEADING_RE = re.compile(r"^(#{1,3})\s+(.*\S)\s*$") # same headings cheats.sh treats as topics
+MD_FENCE_RE = re.compile(r"^\s*(`{3,}|~{3,})(.*)$")
+EXPORT_FENCE_RE = re.compile(r"(`{3,})kb\n(.*)\n\1", re.S) # the fence 'kb export -f md' wraps bodies in
+NOTE_FILE_RE = re.compile(r"^(\d+)\.txt$")
+NOTE_CREATED_RE = re.compile(r"\s*# Created: (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\s*$")
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def read_jsonl(source):
+    """One note per line: {"title", "content", "tags", "date"}; ids are reassigned on import."""
+    f = sys.stdin if source == "-" else open(source, 'r')
+    try:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                yield {"title": item.get('title') or "Untitled", "content": item.get('content') or "",
+                       "tags": list(item.get('tags') or []), "date": item.get('date') or _now()}
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def _md_note(title, lines, topic):
+    tags = [topic] if topic else []
+    if lines and lines[0].startswith("Tags: "): # written by 'kb export -f md'
+        tags = [t.strip() for t in lines.pop(0)[6:].split(",") if t.strip()]
+    content = "".join(lines).strip("\n")
+    exported = EXPORT_FENCE_RE.fullmatch(content)
+    return {"title": title, "content": exported.group(2) if exported else content, "tags": tags, "date": _now()}
+
+def _export_fence(content):
+    """A backtick fence longer than any fence inside the body, so the body can't close it early."""
+    runs = [len(m.group(1)) for line in content.split("\n")
+            if (m := MD_FENCE_RE.match(line)) and m.group(1)[0] == "`"]
+    return "`" * max([3] + [n + 1 for n in runs])
+
+def read_markdown(source):
+    """Every '#'..'###' heading outside a code fence starts a note, tagged with the file's name."""
+    files = [os.path.join(source, f) for f in sorted(os.listdir(source)) if f.endswith(".md")] \
+        if os.path.isdir(source) else [source]
+    for path in files:
+        topic = os.path.splitext(os.path.basename(path))[0]
+        title, lines, fence = None, [], None
+        with open(path, 'r') as f:
+            for line in f:
+                marker = MD_FENCE_RE.match(line)
+                if marker and fence is None:
+                    fence = marker.group(1)
+                elif marker and marker.group(1).startswith(fence) and not marker.group(2).strip():
+                    fence = None # only a bare run of the same character, at least as long, closes it
+                match = None if fence else MD_HEADING_RE.match(line)
+                if match:
+                    if title is not None:
+                        yield _md_note(title, lines, topic)
+                    title, lines = match.group(2), []
+                elif title is not None:
+                    lines.append(line)
+        if title is not None:
+            yield _md_note(title, lines, topic)
+
+def read_notes_dir(source):
+    """note.py's N.txt files (searched recursively), titled by their first line and tagged 'note'."""
+    found = []
+    for root, _, files in os.walk(source):
+        found.extend((int(m.group(1)), os.path.join(root, f)) for f in files if (m := NOTE_FILE_RE.match(f)))
+    for _, path in sorted(found):
+        with open(path, 'r') as f:
+            content = f.read()
+        created = NOTE_CREATED_RE.search(content)
+        if created:
+            content, date = content[:created.start()], created.group(1)
+        else:
+            date = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M:%S")
+        first_line = content.strip().split("\n")[0].strip()
+        yield {"title": first_line[:80] or "Untitled", "content": content.strip(), "tags": ["note"], "date": date}
+
+IMPORT_FORMATS = {"jsonl": read_jsonl, "md": read_markdown, "notes": read_notes_dir}
+
+def _guess_format(source):
+    if os.path.isdir(source):
+        return "md" if any(f.endswith(".md") for f in os.listdir(source)) else "notes"
+    return "md" if source.endswith(".md") else "jsonl"
+
+def import_notes(args):
+    source = os.path.expanduser(args.source)
+    if source != "-" and not os.path.exists(source):
+        print(f"{RED}Error: {source} not found.{RESET}")
+        return
+    fmt = args.format or _guess_format(source)
+    db = open_db(args.backend)
+
+    # Notes are streamed from the source and written one transaction per batch
+    imported, batch = 0, []
+    start = time.perf_counter()
+    for note in IMPORT_FORMATS[fmt](source):
+        note['tags'] = note['tags'] + [t for t in args.tags if t not in note['tags']]
+        batch.append(note)
+        if len(batch) >= args.batch_size:
+            db.add_many(batch)
+            imported += len(batch)
+            batch = []
+            print(f"{CYAN}... {imported} notes{RESET}", end='\r', file=sys.stderr)
+    if batch:
+        db.add_many(batch)
+        imported += len(batch)
+    if imported > args.batch_size:
+        print(" " * 30, end='\r', file=sys.stderr) # clear the progress line
+
+    elapsed = time.perf_counter() - start
+    rate = imported / elapsed if elapsed else 0
+    print(f"✅ {GREEN}Imported {imported} notes ({fmt}) in {elapsed:.2f}s [{rate:.0f} notes/s].{RESET}")
+
+def export_notes(args):
+    db = open_db(args.backend)
+    out = open(os.path.expanduser(args.output), 'w') if args.output else sys.stdout
+    exported = 0
+    start = time.perf_counter()
+    try:
+        for note in db.iter_notes(full=True):
+            if args.format == "md":
+                out.write(f"# {note['title']}\n")
+                out.write(f"Tags: {', '.join(note.get('tags') or [])}\n") # even empty: no file-name tag on import
+                content = note.get('content', '')
+                fence = _export_fence(content) # keeps '#' lines in the body from splitting it on import
+                out.write(f"\n{fence}kb\n{content}\n{fence}\n\n")
+            else:
+                out.write(json.dumps(note, ensure_ascii=False) + "\n")
+            exported += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    rate = exported / elapsed if elapsed else 0
+    print(f"✅ {GREEN}Exported {exported} notes ({args.format}) in {elapsed:.2f}s [{rate:.0f} notes/s].{RESET}",
+          file=sys.stderr)
+
+
+# --- Command: Migrate ---
+def migrate_notes(args):
+    if not os.path.exists(args.source):
+        print(f"{RED}Error: {args.source} not found.{RESET}")
+        return
+    db = open_db("sqlite")
+    if db.count():
+        print(f"{YELLOW}{SQLITE_FILE} already holds {db.count()} notes; nothing to migrate.{RESET}")
+        return
+    copied = migrate_json(db, args.source)
+    print(f"✅ {GREEN}Migrated {copied} notes into {SQLITE_FILE}.{RESET}")
+
+
+# --- Command: Reindex ---
+def reindex_notes(args):
+    db = open_db(args.backend)
+    start = time.perf_counter()
+    conn = db.index.conn
+    with conn:
+        db.index.rebuild(db.all())
+    print(f"✅ {GREEN}Search index rebuilt in {time.perf_counter() - start:.2f}s.{RESET}")
+
+
+# --- Command: Compact ---
+def compact_notes(args):
+    db = open_db(args.backend)
+    if not hasattr(db, 'compact'):
+        print(f"{YELLOW}The '{db.name}' backend has no journal to compact.{RESET}")
+        return
+    size = os.path.getsize(db.journal_path) if os.path.exists(db.journal_path) else 0
+    start = time.perf_counter()
+    db.compact(wait=True)
+    print(f"✅ {GREEN}Folded {size / 1024:.1f} KiB of journal into {db.path} in {time.perf_counter() - start:.2f}s.{RESET}")
+
+
+# --- Command: Bench ---
+def _bench_note(i):
+    return {
+        "title": f"Snippet {i}",
+        "content": f"echo 'example body {i}' | grep example # " + "x" * 200,
+        "tags": ["bench", f"group{i % 50}"],
+        "date": "2025-01-01 00:00:00",
+    }
+
+def _time_ops(fn, ops):
+    start = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    return (time.perf_counter() - start) * 1000 / ops
+
+def _fill(db, size, batch=50000):
+    """Grows a bench database to `size` notes in bounded batches."""
+    start = db.count()
+    for lo in range(start, size, batch):
+        db.add_many([_bench_note(i) for i in range(lo, min(size, lo + batch))])
+
+def _bench_row(db, ops):
+    """ms/op for add, view, edit, delete and search on an already filled database."""
+    ids = [db.add(_bench_note(i)) for i in range(ops)]
+
+    def add(i):
+        db.add(_bench_note(i))
+
+    def view(i):
+        db.get(ids[i])
+
+    def edit(i):
+        note = db.get(ids[i])
+        note['content'] += " edited"
+        db.update(note)
+
+    def delete(i):
+        db.delete(ids[i])
+
+    def search(i):
+        ranked_search(db, f"grep example {i}", limit=20)
+
+    return [_time_ops(op, ops) for op in (add, view, edit, delete, search)]
+
+def _bench_log_note(i, logs=20):
+    """A note holding a pasted log: most repeat one of `logs` bodies, every fourth one is unique."""
+    body = "\n".join(f"2025-01-01 12:{j // 60:02d}:{j % 60:02d} INFO worker-{i % logs} processed batch {j} ok"
+                     for j in range(120))
+    if i % 4 == 0:
+        body += f"\nrun {i} finished"
+    return {"title": f"Log {i}", "content": body, "tags": ["bench", "log"], "date": "2025-01-01 00:00:00"}
+
+def bench_blobs(args):
+    """Space saved by the SQLite blob store on a log-heavy KB, and what inflating bodies costs on reads."""
+    notes = [_bench_log_note(i) for i in range(args.size)]
+    inline = sum(len(n['content'].encode()) for n in notes)
+    print(f"\n{BOLD}{CYAN}--- Blob store benchmark ({args.size} log notes, {inline / 1048576:.1f} MiB of bodies) ---{RESET}")
+    print(f"{'blobs':<8} {'stored MiB':>10} {'saved':>7} {'db MiB':>8} {'view':>10} {'preview':>10}   (ms/op)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, compress in (("dedup", False), ("zlib", True)):
+            db = SqliteBackend(os.path.join(tmp, f"blobs-{label}.db"))
+            db.compress = compress
+            batch = [dict(n) for n in notes]
+            db.add_many(batch)
+            stored = db.conn.execute("SELECT SUM(length(data)) FROM blobs").fetchone()[0]
+            db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            db_size = os.path.getsize(db.path)
+
+            ids = [n['id'] for n in batch]
+            view = _time_ops(lambda i: db.get(ids[i % len(ids)]), args.ops)
+            preview = _time_ops(lambda i: list(db.iter_notes([ids[i % len(ids)]], preview=PREVIEW_CHARS)), args.ops)
+            print(f"{label:<8} {stored / 1048576:>10.2f} {1 - stored / inline:>7.1%} {db_size / 1048576:>8.2f} "
+                  f"{view:>10.3f} {preview:>10.3f}")
+            db.close()
+
+def bench_backends(args):
+    """
+    Times point operations for every backend against a synthetic KB of --size notes,
+    or with --scaling, for one backend as the same KB grows through each listed size.
+    """
+    if args.blobs:
+        bench_blobs(args)
+        return
+    header = f"{'add':>10} {'view':>10} {'edit':>10} {'delete':>10} {'search':>10}   (ms/op)"
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.scaling:
+            name = args.backend or STORAGE_BACKEND
+            sizes = sorted(int(n) for n in args.scaling.split(','))
+            print(f"\n{BOLD}{CYAN}--- Scaling benchmark ({name}, {args.ops} ops each) ---{RESET}")
+            print(f"{'notes':>9} " + header)
+            db = BACKENDS[name](os.path.join(tmp, f"bench-{name}"))
+            for size in sizes:
+                _fill(db, size)
+                row = _bench_row(db, args.ops)
+                print(f"{size:>9} " + " ".join(f"{ms:>10.3f}" for ms in row))
+            db.close()
+            return
+
+        print(f"\n{BOLD}{CYAN}--- Storage benchmark ({args.size} notes, {args.ops} ops each) ---{RESET}")
+        print(f"{'backend':<8} " + header)
+        for name, backend_cls in BACKENDS.items():
+            db = backend_cls(os.path.join(tmp, f"bench-{name}"))
+            _fill(db, args.size)
+            row = _bench_row(db, args.ops)
+            print(f"{name:<8} " + " ".join(f"{ms:>10.3f}" for ms in row))
+            db.close()
 
 
 # --- Main CLI Setup ---
@@ -247,6 +1592,8 @@ def main():
     epilog=f"Version: v{VERSION}"
 )
     parser.add_argument('--version', action='version', version=f'%(prog)s v{VERSION}')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=None,
+                        help=f"Storage backend (default: $KB_BACKEND or '{STORAGE_BACKEND}')")
 
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
@@ -259,15 +1606,26 @@ def main():
 
     # 'list' command
     parser_list = subparsers.add_parser("list", help="List all notes")
-    parser_list.add_argument("-t", "--tag", type=str, help="Filter notes by a specific tag", default=None)
+    parser_list.add_argument("-t", "--tag", type=str, default=None,
+                             help="Filter by tag or tag expression, e.g. 'python and not (deprecated or old)'")
     parser_list.set_defaults(func=list_notes)
 
+    # 'tags' command
+    parser_tags = subparsers.add_parser("tags", help="Show every tag with its note count")
+    parser_tags.set_defaults(func=list_tags)
+
 
     # 'search' command
     parser_search = subparsers.add_parser("search", help="Search notes")
-    parser_search.add_argument("query", type=str, help="Search term")
+    parser_search.add_argument("query", type=str, nargs="?", default="", help="Search term")
     parser_search.add_argument("--tag", dest="tag_only", action="store_true", 
                                 help="Search tags exclusively, ignoring title and content.")
+    parser_search.add_argument("-n", "--limit", type=int, default=20, help="Maximum results to show (default: %(default)s)")
+    parser_search.add_argument("-f", "--fuzzy", action="store_true", help="Typo-tolerant matching by trigram similarity")
+    parser_search.add_argument("--threshold", type=float, default=FUZZY_THRESHOLD, metavar="FLOAT",
+                               help="Minimum similarity (0-1) for --fuzzy and --interactive (default: %(default)s)")
+    parser_search.add_argument("-i", "--interactive", action="store_true",
+                               help="Incremental fuzzy search that refreshes on every keystroke")
     parser_search.set_defaults(func=search_notes)
 
     
@@ -287,6 +1645,45 @@ def main():
     parser_delete.set_defaults(func=delete_note)
 
 
+    # 'import' command
+    parser_import = subparsers.add_parser("import", help="Bulk-import notes from JSONL, Markdown or a notes directory")
+    parser_import.add_argument("source", type=str, help="File or directory to import ('-' reads JSONL from stdin)")
+    parser_import.add_argument("-f", "--format", choices=sorted(IMPORT_FORMATS), default=None,
+                               help="Input format (default: guessed from the source)")
+    parser_import.add_argument("-t", "--tags", nargs="+", default=[], help="Extra tags for every imported note")
+    parser_import.add_argument("--batch-size", type=int, default=1000, help="Notes per transaction (default: %(default)s)")
+    parser_import.set_defaults(func=import_notes)
+
+    # 'export' command
+    parser_export = subparsers.add_parser("export", help="Stream every note out as JSONL or Markdown")
+    parser_export.add_argument("-f", "--format", choices=["jsonl", "md"], default="jsonl", help="Output format (default: %(default)s)")
+    parser_export.add_argument("-o", "--output", type=str, default=None, help="Output file (default: stdout)")
+    parser_export.set_defaults(func=export_notes)
+
+    # 'migrate' command
+    parser_migrate = subparsers.add_parser("migrate", help="Copy the JSON database into the SQLite backend")
+    parser_migrate.add_argument("--source", type=str, default=DB_FILE, help="JSON file to import (default: %(default)s)")
+    parser_migrate.set_defaults(func=migrate_notes)
+
+    # 'reindex' command
+    parser_reindex = subparsers.add_parser("reindex", help="Rebuild the full-text search index")
+    parser_reindex.set_defaults(func=reindex_notes)
+
+    # 'compact' command
+    parser_compact = subparsers.add_parser("compact", help="Fold the write-ahead journal into a new snapshot now")
+    parser_compact.set_defaults(func=compact_notes)
+
+    # 'bench' command
+    parser_bench = subparsers.add_parser("bench", help="Benchmark the storage backends against each other")
+    parser_bench.add_argument("-n", "--size", type=int, default=10000, help="Synthetic KB size (default: %(default)s)")
+    parser_bench.add_argument("--ops", type=int, default=50, help="Operations timed per command (default: %(default)s)")
+    parser_bench.add_argument("--scaling", type=str, metavar="SIZES", default=None,
+                              help="Comma-separated KB sizes to time one backend at, e.g. 1000,10000,100000,1000000")
+    parser_bench.add_argument("--blobs", action="store_true",
+                              help="Measure the SQLite blob store instead: space saved and read overhead")
+    parser_bench.set_defaults(func=bench_backends)
+
+
     # Parse arguments and call function defined by set_defaults
     args = parser.parse_args()
 
@@ -1,54 +1,594 @@
 import argparse
+import collections
+import fcntl
+import json
+import mmap
 import os
+import random
+import re
+import sqlite3
 import subprocess
 import sys
-from datetime import datetime
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 # --- CONFIGURATION ---
 # Notes will be stored as individual text files in this folder.
 NOTES_DIR = os.path.expanduser("~/notes")
 PREVIEW_CHAR_LIMIT = 80  # Increased from 50
+# Next free ID, kept so adding a note never has to list the directory
+COUNTER_FILE = os.path.join(NOTES_DIR, ".next_id")
+# ID, mtime, size, first line and creation time of every note, so listing never opens the notes.
+# It is only a cache: deleting it just makes the next 'note list' rebuild it.
+CATALOG_FILE = os.path.join(NOTES_DIR, ".catalog.db")
+CREATED_RE = re.compile(rb"# Created: ([\d-]+ [\d:]+)\s*$")
+# Packed mode ('note pack'): every note in one append-only file, found through an offset index
+PACK_FILE = os.path.join(NOTES_DIR, "notes.pack")
+PACK_HEADER_RE = re.compile(rb"@@note (\d+) (-?\d+) (\d+)\n")
+SEARCH_WORKERS = min(8, (os.cpu_count() or 2) * 2) # threads scanning notes in parallel
+SEARCH_CACHED_QUERIES = 20 # 'note search --index' keeps results for this many recent queries
 # ---------------------
 
-def get_next_id():
-    """Finds the next available sequential ID based on existing files."""
-    try:
-        if not os.path.exists(NOTES_DIR):
-            return 1
-            
-        existing_ids = []
-        for filename in os.listdir(NOTES_DIR):
-            if filename.endswith(".txt"):
+def shard_dir(note_id):
+    """Two-level shard for an ID: 1234 -> ~/notes/00/12, so no folder holds more than 100 notes."""
+    return os.path.join(NOTES_DIR, f"{note_id // 10000:02d}", f"{note_id // 100 % 100:02d}")
+
+def get_note_filepath(note_id):
+    """Returns the full path for a given note ID (e.g. 1234 -> ~/notes/00/12/1234.txt)."""
+    return os.path.join(shard_dir(note_id), f"{note_id}.txt")
+
+def parse_note_id(filename):
+    """'5.txt' -> 5; None for anything that is not a numbered note."""
+    stem, ext = os.path.splitext(filename)
+    return int(stem) if ext == ".txt" and stem.isdigit() else None
+
+def iter_note_files():
+    """Yields (id, os.DirEntry) for every note in ID order, walking the shard folders in order."""
+    def numbered_dirs(path):
+        with os.scandir(path) as entries:
+            return sorted((int(e.name), e.path) for e in entries if e.name.isdigit() and e.is_dir())
+
+    for _, top in numbered_dirs(NOTES_DIR):
+        for _, leaf in numbered_dirs(top):
+            with os.scandir(leaf) as entries:
+                notes = [(parse_note_id(e.name), e) for e in entries]
+            yield from sorted((n for n in notes if n[0] is not None), key=lambda n: n[0])
+
+def migrate_flat_layout():
+    """
+    Moves notes from the original flat layout (~/notes/5.txt) into their shard folders
+    and seeds the ID counter. Runs once: afterwards the counter file exists.
+    """
+    highest = 0
+    with os.scandir(NOTES_DIR) as entries:
+        flat = [(parse_note_id(e.name), e.path) for e in entries if e.is_file()]
+    for note_id, path in flat:
+        if note_id is None:
+            continue
+        os.makedirs(shard_dir(note_id), exist_ok=True)
+        os.replace(path, get_note_filepath(note_id))
+        highest = max(highest, note_id)
+    for note_id, _ in iter_note_files(): # a migration interrupted halfway
+        highest = max(highest, note_id)
+    moved = sum(1 for note_id, _ in flat if note_id is not None)
+    if moved:
+        print(f"Moved {moved} notes into the sharded layout under {NOTES_DIR}.", file=sys.stderr)
+    return highest + 1
+
+def ensure_notes_dir():
+    """Creates ~/notes on first use and migrates an old flat directory; a no-op once set up."""
+    os.makedirs(NOTES_DIR, exist_ok=True)
+    if not os.path.exists(COUNTER_FILE):
+        with open(COUNTER_FILE + ".tmp", 'w') as f:
+            f.write(str(migrate_flat_layout()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(COUNTER_FILE + ".tmp", COUNTER_FILE)
+
+def allocate_ids(count=1):
+    """
+    Reserves `count` consecutive IDs from the persisted counter and returns the first.
+    The counter is locked while it is bumped, so concurrent `note add`s never share an ID.
+    """
+    ensure_notes_dir()
+    with open(COUNTER_FILE, 'r+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        first = int(f.read().strip() or 1)
+        f.seek(0)
+        f.write(str(first + count))
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+    return first
+
+# --- CATALOG ---
+def open_catalog():
+    conn = sqlite3.connect(CATALOG_FILE)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS notes (
+            id       INTEGER PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size     INTEGER NOT NULL,
+            preview  TEXT NOT NULL,
+            created  TEXT
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS notes_by_mtime ON notes (mtime_ns, id)")
+    # Offset index for packed mode (see sync_pack)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pack_index (
+            id       INTEGER PRIMARY KEY,
+            offset   INTEGER NOT NULL,
+            length   INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        )""")
+    conn.execute("CREATE TABLE IF NOT EXISTS pack_meta (key TEXT PRIMARY KEY, value INTEGER)")
+    return conn
+
+def read_note_meta(path, st):
+    """Catalog row for a note file: only its first line and the '# Created:' trailer are read."""
+    with open(path, 'rb') as f:
+        first_line = f.readline(4 * PREVIEW_CHAR_LIMIT).decode(errors='replace').strip()
+        f.seek(max(st.st_size - 64, 0))
+        match = CREATED_RE.search(f.read())
+    created = match.group(1).decode() if match else None
+    return (st.st_mtime_ns, st.st_size, first_line[:PREVIEW_CHAR_LIMIT + 1], created)
+
+def note_bytes(content, created):
+    """A note as stored on disk: the text, then the '# Created:' trailer."""
+    return f"{content.strip()}\n\n# Created: {created}".encode()
+
+def meta_from_bytes(body, mtime_ns):
+    """Catalog row (minus the ID) for a note already in memory."""
+    first_line = body[:4 * PREVIEW_CHAR_LIMIT].split(b"\n", 1)[0].decode(errors='replace').strip()
+    match = CREATED_RE.search(body[-64:])
+    created = match.group(1).decode() if match else None
+    return (mtime_ns, len(body), first_line[:PREVIEW_CHAR_LIMIT + 1], created)
+
+def catalog_update(note_id):
+    """Refreshes (or drops, if the file is gone) one note's catalog row after add/edit/delete."""
+    filepath = get_note_filepath(note_id)
+    with open_catalog() as conn:
+        if os.path.exists(filepath):
+            conn.execute("INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?)",
+                         (note_id,) + read_note_meta(filepath, os.stat(filepath)))
+        else:
+            conn.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+    conn.close()
+
+def sync_catalog(conn):
+    """
+    Revalidates the catalog against one stat per note (no file is opened unless its mtime or
+    size changed), picking up notes added, edited or removed outside note.py.
+    Returns how many rows were refreshed.
+    """
+    known = {row[0]: row[1:] for row in conn.execute("SELECT id, mtime_ns, size FROM notes")}
+    changed = []
+    for note_id, entry in iter_note_files():
+        st = entry.stat()
+        if known.pop(note_id, None) != (st.st_mtime_ns, st.st_size):
+            changed.append((note_id,) + read_note_meta(entry.path, st))
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?)", changed)
+        conn.executemany("DELETE FROM notes WHERE id = ?", [(note_id,) for note_id in known])
+        conn.execute("INSERT OR REPLACE INTO pack_meta VALUES ('synced', 1)") # see catalog_synced
+    return len(changed) + len(known)
+
+def catalog_synced(conn):
+    """Whether sync_catalog has ever filled this catalog (a new, deleted or migrated one hasn't)."""
+    return conn.execute("SELECT 1 FROM pack_meta WHERE key = 'synced'").fetchone() is not None
+
+def revalidate_rows(conn, note_ids):
+    """Stat-checks just these catalog rows (one page of a listing). Returns True if any changed."""
+    changed = []
+    for note_id in note_ids:
+        filepath = get_note_filepath(note_id)
+        try:
+            st = os.stat(filepath)
+        except FileNotFoundError:
+            changed.append(note_id)
+            conn.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+            continue
+        row = conn.execute("SELECT mtime_ns, size FROM notes WHERE id = ?", (note_id,)).fetchone()
+        if row != (st.st_mtime_ns, st.st_size):
+            changed.append(note_id)
+            conn.execute("INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?)",
+                         (note_id,) + read_note_meta(filepath, st))
+    conn.commit()
+    return bool(changed)
+
+# --- PACKED STORAGE ---
+def is_packed():
+    return os.path.exists(PACK_FILE)
+
+def pack_record(note_id, body, mtime_ns=None):
+    """One pack record: a header line, then the note's bytes. A body of None records a deletion."""
+    mtime_ns = mtime_ns or time.time_ns()
+    if body is None:
+        return b"@@note %d -1 %d\n" % (note_id, mtime_ns)
+    return b"@@note %d %d %d\n" % (note_id, len(body), mtime_ns) + body + b"\n"
+
+def append_records(records):
+    """Appends records to the pack in one fsync'd write; edits and deletes never rewrite it."""
+    with open(PACK_FILE, 'ab') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(b"".join(records))
+        f.flush()
+        os.fsync(f.fileno())
+
+def sync_pack(conn):
+    """
+    Indexes records appended to the pack since the last call: the offset index for reads and
+    the catalog rows 'list' shows. With an empty index (e.g. a deleted catalog) the whole pack
+    is read once. A record cut short by a crash is trimmed off the end.
+    """
+    row = conn.execute("SELECT value FROM pack_meta WHERE key = 'indexed_to'").fetchone()
+    pos = row[0] if row else 0
+
+    with open(PACK_FILE, 'rb+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        size = os.fstat(f.fileno()).st_size
+        if pos == size:
+            return
+        with conn:
+            if pos > size or not row: # first use, or the pack was rewritten: index it from scratch
+                conn.execute("DELETE FROM pack_index")
+                conn.execute("DELETE FROM notes")
+                pos = 0
+            f.seek(pos)
+            while pos < size:
+                header = f.readline()
+                m = PACK_HEADER_RE.fullmatch(header)
+                length = int(m.group(2)) if m else 0
+                if m is None or pos + len(header) + (length + 1 if length >= 0 else 0) > size:
+                    f.truncate(pos)
+                    break
+                note_id, mtime_ns = int(m.group(1)), int(m.group(3))
+                if length < 0:
+                    conn.execute("DELETE FROM pack_index WHERE id = ?", (note_id,))
+                    conn.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+                    pos += len(header)
+                    continue
+                body = f.read(length + 1)[:length]
+                conn.execute("INSERT OR REPLACE INTO pack_index VALUES (?, ?, ?, ?)",
+                             (note_id, pos + len(header), length, mtime_ns))
+                conn.execute("INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?)",
+                             (note_id,) + meta_from_bytes(body, mtime_ns))
+                pos += len(header) + length + 1
+            conn.execute("INSERT OR REPLACE INTO pack_meta VALUES ('indexed_to', ?)", (pos,))
+
+def read_packed(conn, note_id):
+    """A packed note's bytes, read straight from its offset; None if there is no such note."""
+    row = conn.execute("SELECT offset, length FROM pack_index WHERE id = ?", (note_id,)).fetchone()
+    if row is None:
+        return None
+    with open(PACK_FILE, 'rb') as f:
+        return os.pread(f.fileno(), row[1], row[0])
+
+def remove_empty_shards():
+    for top in os.scandir(NOTES_DIR):
+        if top.name.isdigit() and top.is_dir():
+            for leaf in os.scandir(top.path):
+                if leaf.name.isdigit() and leaf.is_dir():
+                    try:
+                        os.rmdir(leaf.path)
+                    except OSError:
+                        pass
+            try:
+                os.rmdir(top.path)
+            except OSError:
+                pass
+
+def pack_storage():
+    """
+    Moves every loose note into the pack (or, when already packed, rewrites the pack without
+    superseded and deleted records). Returns how many notes were packed.
+    """
+    ensure_notes_dir()
+    conn = open_catalog()
+    loose = []
+    with open(PACK_FILE + ".tmp", 'wb') as out:
+        if is_packed():
+            sync_pack(conn)
+            rows = conn.execute("SELECT id, offset, length, mtime_ns FROM pack_index ORDER BY id").fetchall()
+            with open(PACK_FILE, 'rb') as f:
+                for note_id, offset, length, mtime_ns in rows:
+                    out.write(pack_record(note_id, os.pread(f.fileno(), length, offset), mtime_ns))
+            count = len(rows)
+        else:
+            loose = list(iter_note_files())
+            for note_id, entry in loose:
+                with open(entry.path, 'rb') as f:
+                    out.write(pack_record(note_id, f.read(), entry.stat().st_mtime_ns))
+            count = len(loose)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(PACK_FILE + ".tmp", PACK_FILE)
+
+    # The pack is authoritative from here on; the index is rebuilt and the loose files go
+    with conn:
+        conn.execute("DELETE FROM pack_meta")
+    sync_pack(conn)
+    conn.close()
+    for _, entry in loose:
+        os.remove(entry.path)
+    remove_empty_shards()
+    return count
+
+def unpack_storage():
+    """Writes every packed note back out as a loose file (keeping its mtime) and removes the pack."""
+    conn = open_catalog()
+    sync_pack(conn)
+    rows = conn.execute("SELECT id, offset, length, mtime_ns FROM pack_index ORDER BY id").fetchall()
+    with open(PACK_FILE, 'rb') as f:
+        for note_id, offset, length, mtime_ns in rows:
+            os.makedirs(shard_dir(note_id), exist_ok=True)
+            filepath = get_note_filepath(note_id)
+            with open(filepath, 'wb') as out:
+                out.write(os.pread(f.fileno(), length, offset))
+            os.utime(filepath, ns=(mtime_ns, mtime_ns))
+    os.remove(PACK_FILE)
+    # Catalog rows stay valid: every file got the same size and mtime its record had
+    with conn:
+        conn.execute("DELETE FROM pack_index")
+        conn.execute("DELETE FROM pack_meta")
+    conn.close()
+    return len(rows)
+# ---------------------
+
+def parse_when(text, end=False):
+    """'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM' -> ns timestamp; a bare date used as an end bound covers the whole day."""
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            when = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if end:
+            when += timedelta(days=1) if fmt == "%Y-%m-%d" else timedelta(minutes=1)
+        return int(when.timestamp() * 1e9)
+    raise ValueError(f"Invalid date '{text}' (use YYYY-MM-DD or 'YYYY-MM-DD HH:MM').")
+# ---------------------
+
+# --- SEARCH ---
+def compile_pattern(pattern, literal=False, ignore_case=False):
+    """Byte regex for a search; literal mode escapes the pattern first."""
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    return re.compile(re.escape(pattern.encode()) if literal else pattern.encode(), flags)
+
+def scan_note(path, regex, context=0):
+    """Matches in one note file, read through mmap so only the pages actually scanned are touched."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return scan_buffer(mm, regex, context)
+
+def scan_buffer(buf, regex, context=0):
+    """
+    Matches in one note's bytes (an mmap or a bytes slice of the pack).
+    Returns [(line_no, line, [(line_no, context_line), ...]), ...], one entry per matching line.
+    """
+    hits = []
+    line_no, counted_to, pos = 1, 0, 0
+    while True:
+        m = regex.search(buf, pos)
+        if m is None or (m.start() == len(buf) and buf[-1:] == b"\n"): # nothing after a final newline
+            break
+        start = buf.rfind(b"\n", 0, m.start()) + 1
+        end = buf.find(b"\n", m.start())
+        end = len(buf) if end == -1 else end
+        line_no += buf[counted_to:start].count(b"\n")
+        counted_to = start
+
+        around = []
+        if context:
+            lo = start
+            for _ in range(context):
+                if lo == 0:
+                    break
+                lo = buf.rfind(b"\n", 0, lo - 1) + 1
+            hi = end
+            for _ in range(context):
+                if hi + 1 >= len(buf):
+                    break
+                nxt = buf.find(b"\n", hi + 1)
+                hi = len(buf) if nxt == -1 else nxt
+            before = buf[lo:start].decode(errors='replace').split("\n")[:-1] if start > lo else []
+            after = buf[end + 1:hi].decode(errors='replace').split("\n") if hi > end else []
+            around = ([(line_no - len(before) + i, l) for i, l in enumerate(before)] +
+                      [(line_no + 1 + i, l) for i, l in enumerate(after)])
+        hits.append((line_no, buf[start:end].decode(errors='replace'), around))
+        pos = end + 1 # one hit per line, like grep
+        if pos > len(buf):
+            break
+    return hits
+
+def scan_notes(regex, context=0, cached=None):
+    """
+    Streams (note_id, mtime_ns, size, hits, from_cache) in ID order while up to SEARCH_WORKERS
+    threads read ahead. `cached` maps id -> (mtime_ns, size, hits); unchanged notes are not reopened.
+    """
+    if is_packed():
+        yield from scan_pack(regex, context, cached)
+        return
+    window = collections.deque()
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+        def drain(limit):
+            while len(window) > limit:
+                note_id, st, hits, from_cache = window.popleft()
                 try:
-                    # Filename is the ID (e.g., '5.txt' -> 5)
-                    existing_ids.append(int(os.path.splitext(filename)[0]))
-                except ValueError:
-                    # Ignore files that are not numbered notes
+                    result = hits.result() if not from_cache else hits
+                except OSError as e:
+                    print(f"Error reading note {note_id}: {e}", file=sys.stderr)
                     continue
-        
-        # Return the next highest ID or 1 if no files exist
-        return max(existing_ids) + 1 if existing_ids else 1
-    
-    except Exception as e:
-        print(f"Error determining next ID: {e}", file=sys.stderr)
-        return 1
+                yield note_id, st.st_mtime_ns, st.st_size, result, from_cache
 
-def get_note_filepath(note_id):
-    """Returns the full path for a given note ID."""
-    return os.path.join(NOTES_DIR, f"{note_id}.txt")
+        for note_id, entry in iter_note_files():
+            st = entry.stat()
+            hit = (cached or {}).get(note_id)
+            if hit and hit[:2] == (st.st_mtime_ns, st.st_size):
+                window.append((note_id, st, hit[2], True))
+            else:
+                window.append((note_id, st, pool.submit(scan_note, entry.path, regex, context), False))
+            yield from drain(SEARCH_WORKERS * 4)
+        yield from drain(0)
+
+def scan_pack(regex, context=0, cached=None):
+    """scan_notes for packed mode: one mmap of the pack, each note scanned in place at its offset."""
+    conn = open_catalog()
+    sync_pack(conn)
+    rows = conn.execute("SELECT id, offset, length, mtime_ns FROM pack_index ORDER BY id").fetchall()
+    conn.close()
+    if os.path.getsize(PACK_FILE) == 0:
+        return
+    with open(PACK_FILE, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for note_id, offset, length, mtime_ns in rows:
+            hit = (cached or {}).get(note_id)
+            if hit and hit[:2] == (mtime_ns, length):
+                yield note_id, mtime_ns, length, hit[2], True
+            else:
+                yield note_id, mtime_ns, length, scan_buffer(mm[offset:offset + length], regex, context), False
+
+def search_notes(args):
+    """Searches every note for a regex (or, with --fixed, a literal string), printing matches as they are found."""
+    if not os.path.exists(NOTES_DIR):
+        print("No notes directory found. Use 'note add' to start.")
+        return
+    ensure_notes_dir()
+    try:
+        regex = compile_pattern(args.pattern, args.fixed, args.ignore_case)
+    except re.error as e:
+        print(f"Error: Invalid pattern '{args.pattern}': {e}", file=sys.stderr)
+        return
+
+    # With --index, results are kept per (query, note) and reused while the note's mtime and size match
+    conn, cached = None, None
+    query_key = json.dumps([args.pattern, args.fixed, args.ignore_case, args.context])
+    if args.index:
+        conn = open_catalog()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_cache (
+                query    TEXT NOT NULL,
+                id       INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size     INTEGER NOT NULL,
+                hits     TEXT NOT NULL,
+                PRIMARY KEY (query, id)
+            )""")
+        conn.execute("CREATE TABLE IF NOT EXISTS search_queries (query TEXT PRIMARY KEY, used REAL NOT NULL)")
+        cached = {row[0]: (row[1], row[2], json.loads(row[3])) for row in conn.execute(
+            "SELECT id, mtime_ns, size, hits FROM search_cache WHERE query = ?", (query_key,))}
+
+    start = time.perf_counter()
+    matches = notes_matched = scanned = reused = 0
+    fresh = []
+    for note_id, mtime_ns, size, hits, from_cache in scan_notes(regex, args.context, cached):
+        if from_cache:
+            reused += 1
+        else:
+            scanned += 1
+            fresh.append((query_key, note_id, mtime_ns, size, json.dumps(hits)))
+        if not hits:
+            continue
+        notes_matched += 1
+        for line_no, line, around in hits:
+            matches += 1
+            for ctx_no, ctx in around:
+                if ctx_no < line_no:
+                    print(f"[{note_id}] {ctx_no}- {ctx}")
+            print(f"[{note_id}] {line_no}: {line}")
+            for ctx_no, ctx in around:
+                if ctx_no > line_no:
+                    print(f"[{note_id}] {ctx_no}- {ctx}")
+            if args.context:
+                print("--")
+    elapsed = time.perf_counter() - start
+
+    if conn is not None:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?, ?)", fresh)
+            conn.execute("INSERT OR REPLACE INTO search_queries VALUES (?, ?)", (query_key, time.time()))
+            stale = [row[0] for row in conn.execute(
+                "SELECT query FROM search_queries ORDER BY used DESC LIMIT -1 OFFSET ?", (SEARCH_CACHED_QUERIES,))]
+            for query in stale:
+                conn.execute("DELETE FROM search_cache WHERE query = ?", (query,))
+                conn.execute("DELETE FROM search_queries WHERE query = ?", (query,))
+        conn.close()
+
+    summary = f"{matches} matches in {notes_matched} notes ({scanned} scanned"
+    summary += f", {reused} unchanged and skipped" if args.index else ""
+    print(f"\n{summary}) in {elapsed:.2f}s.", file=sys.stderr)
+# ---------------------
+
+def write_note(note_id, content, created):
+    """Creates one note file (never overwriting) and returns its catalog row."""
+    body = note_bytes(content, created)
+    os.makedirs(shard_dir(note_id), exist_ok=True)
+    with open(get_note_filepath(note_id), 'xb') as f:
+        f.write(body)
+        f.flush()
+        mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+    return (note_id,) + meta_from_bytes(body, mtime_ns)
+
+def split_notes(text, separator):
+    """Splits a stream into note bodies at every `separator` match, dropping empty pieces."""
+    return [piece for piece in re.split(separator, text) if piece.strip()]
+
+def add_many_notes(args):
+    """Adds one note per chunk of stdin, reserving the whole ID block with a single counter update."""
+    bodies = split_notes(sys.stdin.read(), args.split)
+    if not bodies:
+        print("Nothing to add: stdin was empty.", file=sys.stderr)
+        return
+
+    start = time.perf_counter()
+    first_id = allocate_ids(len(bodies))
+    created = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = []
+    conn = open_catalog()
+    if is_packed():
+        append_records([pack_record(first_id + offset, note_bytes(body, created)) for offset, body in enumerate(bodies)])
+        sync_pack(conn)
+        rows = bodies
+    else:
+        try:
+            for offset, body in enumerate(bodies):
+                rows.append(write_note(first_id + offset, body, created))
+        except OSError as e:
+            print(f"Error saving note {first_id + len(rows)}: {e}", file=sys.stderr)
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?)", rows)
+    conn.close()
+
+    elapsed = time.perf_counter() - start
+    if rows:
+        rate = len(rows) / elapsed if elapsed else 0
+        print(f"✅ Added {len(rows)} notes (IDs {first_id}-{first_id + len(rows) - 1}) in {elapsed:.2f}s [{rate:.0f} notes/s].")
 
 def add_note(args):
     """Adds a new note by creating a new file."""
-    if not os.path.exists(NOTES_DIR):
-        os.makedirs(NOTES_DIR)
-        
-    new_id = get_next_id()
-    filepath = get_note_filepath(new_id)
+    if args.stdin:
+        add_many_notes(args)
+        return
+    if args.content is None:
+        print("Error: Give the note content, or use --stdin to read notes from a pipe.", file=sys.stderr)
+        return
+
+    new_id = allocate_ids()
     
     try:
-        with open(filepath, 'w') as f:
-            f.write(args.content.strip())
-            f.write(f"\n\n# Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        created = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        conn = open_catalog()
+        if is_packed():
+            append_records([pack_record(new_id, note_bytes(args.content, created))])
+            sync_pack(conn)
+        else:
+            row = write_note(new_id, args.content, created)
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?)", row)
+        conn.close()
         
         print(f"✅ Note added successfully with ID: {new_id}")
     except Exception as e:
@@ -56,7 +596,11 @@ def add_note(args):
 
 def edit_note(args):
     """Opens an existing note file in the default editor (nano)."""
+    ensure_notes_dir()
     note_id = args.id
+    if is_packed():
+        edit_packed_note(args)
+        return
     filepath = get_note_filepath(note_id)
 
     if not os.path.exists(filepath):
@@ -69,19 +613,62 @@ def edit_note(args):
     try:
         # Open the editor directly on the note file
         subprocess.run([editor, filepath], check=True)
+        catalog_update(note_id)
+        print(f"✅ Note ID {note_id} edited.")
+    except subprocess.CalledProcessError:
+        print("Editor failed or was closed improperly.", file=sys.stderr)
+    except Exception as e:
+        print(f"An error occurred during editing: {e}", file=sys.stderr)
+
+def edit_packed_note(args):
+    """Packed mode: the note is extracted to a temp file for the editor and appended back if it changed."""
+    note_id = args.id
+    conn = open_catalog()
+    sync_pack(conn)
+    body = read_packed(conn, note_id)
+    if body is None:
+        print(f"Error: Note with ID '{note_id}' not found in {PACK_FILE}.", file=sys.stderr)
+        conn.close()
+        return
+
+    editor = os.environ.get('EDITOR', 'nano')
+    with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as tmp:
+        tmp.write(body)
+        tmp_path = tmp.name
+    try:
+        subprocess.run([editor, tmp_path], check=True)
+        with open(tmp_path, 'rb') as f:
+            edited = f.read()
+        if edited != body:
+            append_records([pack_record(note_id, edited)])
+            sync_pack(conn)
         print(f"✅ Note ID {note_id} edited.")
     except subprocess.CalledProcessError:
         print("Editor failed or was closed improperly.", file=sys.stderr)
     except Exception as e:
         print(f"An error occurred during editing: {e}", file=sys.stderr)
+    finally:
+        os.remove(tmp_path)
+        conn.close()
 
 # --- NEW FUNCTION FOR VIEWING ---
 def view_note(args):
     """Views the full content of a note using a pager (like less)."""
+    ensure_notes_dir()
     note_id = args.id
     filepath = get_note_filepath(note_id)
 
-    if not os.path.exists(filepath):
+    # In packed mode the note is read at its offset in the pack and piped to the pager
+    body = None
+    if is_packed():
+        conn = open_catalog()
+        sync_pack(conn)
+        body = read_packed(conn, note_id)
+        conn.close()
+        missing = body is None
+    else:
+        missing = not os.path.exists(filepath)
+    if missing:
         print(f"Error: Note with ID '{note_id}' not found.", file=sys.stderr)
         return
 
@@ -90,66 +677,281 @@ def view_note(args):
     
     try:
         # Pass the file directly to the pager for easy scrolling
-        subprocess.run([pager, filepath], check=True)
+        if body is not None:
+            subprocess.run([pager], input=body, check=True)
+        else:
+            subprocess.run([pager, filepath], check=True)
     except Exception as e:
         print(f"Error viewing note: {e}", file=sys.stderr)
 # --------------------------------
 
 def list_notes(args):
-    """Lists all notes with their IDs and content previews."""
+    """Lists notes with their IDs and content previews, optionally one page or date range at a time."""
     if not os.path.exists(NOTES_DIR):
         print("No notes directory found. Use 'note add' to start.")
         return
+    ensure_notes_dir()
+
+    try:
+        since = parse_when(args.since) if args.since else None
+        until = parse_when(args.until, end=True) if args.until else None
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return
+
+    # Filters and pages are answered from the catalog's id and mtime indexes
+    where, params = [], []
+    if since is not None:
+        where.append("mtime_ns >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("mtime_ns < ?")
+        params.append(until)
+    query = "SELECT id, mtime_ns, preview FROM notes"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY id DESC" if args.reverse else " ORDER BY id"
+    if args.limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params += [args.limit, args.offset]
+    elif args.offset:
+        query += " LIMIT -1 OFFSET ?"
+        params.append(args.offset)
 
     print("\n--- LOCAL TERMUX NOTES ---")
     found = False
     
-    for filename in sorted(os.listdir(NOTES_DIR), key=lambda x: int(os.path.splitext(x)[0]) if os.path.splitext(x)[0].isdigit() else 0):
-        if filename.endswith(".txt"):
-            try:
-                note_id = os.path.splitext(filename)[0]
-                filepath = get_note_filepath(note_id)
-                
-                with open(filepath, 'r') as f:
-                    content = f.read()
-
-                # Get the modification time
-                mod_time = os.path.getmtime(filepath)
-                time_str = datetime.fromtimestamp(mod_time).strftime("%Y-%m-%d %H:%M")
-                
-                # Use the first line of content for the preview
-                first_line = content.split('\n')[0].strip()
-                preview = first_line[:PREVIEW_CHAR_LIMIT]
-                
-                if len(first_line) > PREVIEW_CHAR_LIMIT:
-                    preview += '...'
-                
-                print(f"ID: {note_id.ljust(4)} | {time_str} | {preview}")
-                found = True
-
-            except Exception as e:
-                print(f"Error processing file {filename}: {e}", file=sys.stderr)
-                
+    # The catalog holds each note's mtime and first line; notes are only opened if they changed.
+    # A page (--limit) only stat-checks its own rows, so it is as fast with 100 notes as with 100,000;
+    # a full listing revalidates everything and also picks up notes created outside note.py.
+    conn = open_catalog()
+    try:
+        if is_packed(): # the pack index is the catalog's only source; it is brought up to date instead
+            sync_pack(conn)
+            rows = conn.execute(query, params)
+        elif args.limit is None or not catalog_synced(conn): # a page needs a filled catalog to page through
+            sync_catalog(conn)
+            rows = conn.execute(query, params)
+        else:
+            rows = conn.execute(query, params).fetchall()
+            while revalidate_rows(conn, [row[0] for row in rows]):
+                rows = conn.execute(query, params).fetchall()
+    except OSError as e:
+        print(f"Error refreshing the note catalog: {e}", file=sys.stderr)
+        rows = conn.execute(query, params)
+
+    shown = 0
+    for note_id, mtime_ns, first_line in rows:
+        shown += 1
+        time_str = datetime.fromtimestamp(mtime_ns / 1e9).strftime("%Y-%m-%d %H:%M")
+        preview = first_line[:PREVIEW_CHAR_LIMIT]
+        
+        if len(first_line) > PREVIEW_CHAR_LIMIT:
+            preview += '...'
+        
+        print(f"ID: {str(note_id).ljust(4)} | {time_str} | {preview}")
+        found = True
+    conn.close()
+            
     if not found:
         print("No notes found. Use 'note add \"My first note\"' to start.")
     else:
+        if args.limit is not None and shown == args.limit:
+            print(f"\nMore notes: 'note list --limit {args.limit} --offset {args.offset + args.limit}'.")
         print("\nUse 'note view [id]' to see the full content.")
     print("--------------------------")
 
-def delete_note(args):
-    """Deletes a note file."""
-    note_id = args.id
-    filepath = get_note_filepath(note_id)
+def parse_id_spec(specs):
+    """['3', '5-9', '12,14'] -> sorted, merged (low, high) ranges; raises ValueError on anything else."""
+    ranges = []
+    for spec in specs:
+        for part in spec.split(','):
+            if not part:
+                continue
+            lo, sep, hi = part.partition('-')
+            if not lo.isdigit() or (sep and not hi.isdigit()):
+                raise ValueError(f"Invalid note ID or range '{part}' (use 5, 5-9 or 5,7,9).")
+            lo, hi = int(lo), int(hi) if sep else int(lo)
+            ranges.append((min(lo, hi), max(lo, hi)))
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(hi, merged[-1][1]))
+        else:
+            merged.append((lo, hi))
+    return merged
 
-    if not os.path.exists(filepath):
-        print(f"Error: Note with ID '{note_id}' not found.", file=sys.stderr)
+def delete_notes(ranges):
+    """
+    Deletes every note inside the ID `ranges` in one pass over just the shard folders they
+    overlap; folders that do not exist cost nothing, so wide ranges are cheap. Returns the IDs removed.
+    """
+    def overlaps(lo, hi):
+        return any(r_lo <= hi and lo <= r_hi for r_lo, r_hi in ranges)
+
+    def numbered(path):
+        try:
+            with os.scandir(path) as entries:
+                return [(int(e.name), e.path) for e in entries if e.name.isdigit() and e.is_dir()]
+        except FileNotFoundError:
+            return []
+
+    removed = []
+    for top, top_path in numbered(NOTES_DIR):
+        if not overlaps(top * 10000, top * 10000 + 9999):
+            continue
+        for leaf, leaf_path in numbered(top_path):
+            base = top * 10000 + leaf * 100
+            if not overlaps(base, base + 99):
+                continue
+            with os.scandir(leaf_path) as entries:
+                present = [(parse_note_id(e.name), e.path) for e in entries]
+            for note_id, path in present:
+                if note_id is not None and overlaps(note_id, note_id):
+                    os.remove(path)
+                    removed.append(note_id)
+
+    conn = open_catalog()
+    with conn:
+        conn.executemany("DELETE FROM notes WHERE id = ?", [(note_id,) for note_id in removed])
+    conn.close()
+    return removed
+
+def delete_packed_notes(ranges):
+    """Packed mode: one deletion record per note, appended in a single write."""
+    conn = open_catalog()
+    sync_pack(conn)
+    removed = []
+    for lo, hi in ranges:
+        removed += [row[0] for row in conn.execute("SELECT id FROM pack_index WHERE id BETWEEN ? AND ?", (lo, hi))]
+    if removed:
+        append_records([pack_record(note_id, None) for note_id in removed])
+        sync_pack(conn)
+    conn.close()
+    return removed
+
+def delete_note(args):
+    """Deletes note files: single IDs, ranges (5-9) and lists (5,7,9) can be mixed."""
+    ensure_notes_dir()
+    try:
+        ranges = parse_id_spec(args.id)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return
+    if not ranges:
+        print("Error: No note IDs given.", file=sys.stderr)
         return
 
+    start = time.perf_counter()
     try:
-        os.remove(filepath)
-        print(f"🗑️ Note ID {note_id} deleted successfully.")
+        removed = delete_packed_notes(ranges) if is_packed() else delete_notes(ranges)
     except Exception as e:
         print(f"Error deleting note file: {e}", file=sys.stderr)
+        return
+    elapsed = time.perf_counter() - start
+
+    requested = sum(hi - lo + 1 for lo, hi in ranges)
+    if requested == 1:
+        if removed:
+            print(f"🗑️ Note ID {ranges[0][0]} deleted successfully.")
+        else:
+            print(f"Error: Note with ID '{ranges[0][0]}' not found.", file=sys.stderr)
+        return
+    rate = len(removed) / elapsed if elapsed else 0
+    missing = requested - len(removed)
+    print(f"🗑️ Deleted {len(removed)} notes in {elapsed:.2f}s [{rate:.0f} notes/s]"
+          + (f"; {missing} IDs had no note." if missing else "."))
+
+def pack_notes(args):
+    """Switches to packed storage (or compacts an existing pack)."""
+    if not os.path.exists(NOTES_DIR):
+        print("No notes directory found. Use 'note add' to start.")
+        return
+    repack = is_packed()
+    before = os.path.getsize(PACK_FILE) if repack else 0
+    start = time.perf_counter()
+    count = pack_storage()
+    elapsed = time.perf_counter() - start
+    if repack:
+        saved = (before - os.path.getsize(PACK_FILE)) / 1024
+        print(f"📦 Compacted {PACK_FILE}: {count} notes, {saved:.1f} KiB reclaimed in {elapsed:.2f}s.")
+    else:
+        print(f"📦 Packed {count} notes into {PACK_FILE} in {elapsed:.2f}s.")
+
+def unpack_notes(args):
+    """Switches back to one file per note."""
+    if not is_packed():
+        print("Notes are already stored as individual files.")
+        return
+    start = time.perf_counter()
+    count = unpack_storage()
+    print(f"📂 Unpacked {count} notes into {NOTES_DIR} in {time.perf_counter() - start:.2f}s.")
+
+def use_notes_dir(path):
+    """Points every storage path at another notes folder (used by the benchmark)."""
+    global NOTES_DIR, COUNTER_FILE, CATALOG_FILE, PACK_FILE
+    NOTES_DIR = path
+    COUNTER_FILE = os.path.join(path, ".next_id")
+    CATALOG_FILE = os.path.join(path, ".catalog.db")
+    PACK_FILE = os.path.join(path, "notes.pack")
+
+def _bench_layout(views, backup_path):
+    """files, allocated KiB, list s, view ms/op and backup s for whatever layout is current."""
+    files = allocated = 0
+    for root, _, names in os.walk(NOTES_DIR):
+        for name in names:
+            files += 1
+            allocated += os.stat(os.path.join(root, name)).st_blocks * 512
+
+    conn = open_catalog()
+    start = time.perf_counter()
+    if is_packed():
+        sync_pack(conn)
+    else:
+        sync_catalog(conn)
+    conn.execute("SELECT id, mtime_ns, preview FROM notes ORDER BY id").fetchall()
+    list_s = time.perf_counter() - start
+
+    ids = [row[0] for row in conn.execute("SELECT id FROM notes")]
+    picks = [random.choice(ids) for _ in range(views)]
+    start = time.perf_counter()
+    for note_id in picks:
+        if is_packed():
+            read_packed(conn, note_id)
+        else:
+            with open(get_note_filepath(note_id), 'rb') as f:
+                f.read()
+    view_ms = (time.perf_counter() - start) * 1000 / views
+    conn.close()
+
+    start = time.perf_counter()
+    with tarfile.open(backup_path, 'w:gz') as tar:
+        tar.add(NOTES_DIR, arcname="notes")
+    backup_s = time.perf_counter() - start
+    os.remove(backup_path)
+    return files, allocated / 1024, list_s, view_ms, backup_s
+
+def bench_storage(args):
+    """Compares the loose-file and packed layouts on the same synthetic notes in a temp folder."""
+    real_dir = NOTES_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        use_notes_dir(os.path.join(tmp, "notes"))
+        try:
+            first_id = allocate_ids(args.size)
+            created = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for i in range(args.size):
+                write_note(first_id + i, f"Bench note {i}\n" + "termux shell snippet " * (i % 40 + 1), created)
+
+            print(f"\n--- STORAGE BENCHMARK ({args.size} notes, {args.views} views) ---")
+            print(f"{'layout':<8} {'files':>7} {'disk KiB':>10} {'list s':>8} {'view ms':>8} {'backup s':>9}")
+            for layout in ("loose", "packed"):
+                if layout == "packed":
+                    pack_storage()
+                files, kib, list_s, view_ms, backup_s = _bench_layout(args.views, os.path.join(tmp, "backup.tar.gz"))
+                print(f"{layout:<8} {files:>7} {kib:>10.0f} {list_s:>8.3f} {view_ms:>8.3f} {backup_s:>9.2f}")
+            print("--------------------------")
+        finally:
+            use_notes_dir(real_dir)
 
 
 def main():
@@ -160,7 +962,11 @@ def main():
 
     # --- Add Command ---
     parser_add = subparsers.add_parser('add', help='Add a new note.')
-    parser_add.add_argument('content', type=str, help='The content of the new note.')
+    parser_add.add_argument('content', type=str, nargs='?', default=None, help='The content of the new note.')
+    parser_add.add_argument('--stdin', action='store_true',
+                            help='Read notes from stdin instead, one per chunk (see --split).')
+    parser_add.add_argument('--split', type=str, default=r'\n[ \t]*\n',
+                            help="Regex separating notes on stdin (default: a blank line; use '\\n' for one note per line).")
     parser_add.set_defaults(func=add_note)
 
     # --- Edit Command ---
@@ -175,14 +981,39 @@ def main():
 
     # --- List Command ---
     parser_list = subparsers.add_parser('list', help='List all notes.')
+    parser_list.add_argument('-n', '--limit', type=int, default=None, help='Show at most this many notes.')
+    parser_list.add_argument('--offset', type=int, default=0, help='Skip this many notes first (use with --limit to page).')
+    parser_list.add_argument('--since', type=str, default=None, help="Only notes modified on/after this date (YYYY-MM-DD ['HH:MM']).")
+    parser_list.add_argument('--until', type=str, default=None, help="Only notes modified on/before this date (YYYY-MM-DD ['HH:MM']).")
+    parser_list.add_argument('-r', '--reverse', action='store_true', help='Newest notes first.')
     parser_list.set_defaults(func=list_notes)
     
+    # --- Search Command ---
+    parser_search = subparsers.add_parser('search', help='Search the content of all notes.')
+    parser_search.add_argument('pattern', type=str, help='Regular expression (or literal text with -F) to look for.')
+    parser_search.add_argument('-F', '--fixed', action='store_true', help='Treat the pattern as literal text.')
+    parser_search.add_argument('-i', '--ignore-case', action='store_true', help='Case-insensitive matching.')
+    parser_search.add_argument('-C', '--context', type=int, default=0, help='Lines of context around each match.')
+    parser_search.add_argument('--index', action='store_true',
+                               help='Cache results so repeating a search skips notes that have not changed.')
+    parser_search.set_defaults(func=search_notes)
+
     # --- Delete Command ---
-    parser_delete = subparsers.add_parser('delete', help='Delete an existing note by ID.')
-    parser_delete.add_argument('id', type=int, help='The ID of the note to delete.')
+    parser_delete = subparsers.add_parser('delete', help='Delete notes by ID, range or list.')
+    parser_delete.add_argument('id', type=str, nargs='+', help='IDs to delete, e.g. 4, 10-20 or 3,5,8.')
     parser_delete.set_defaults(func=delete_note)
 
 
+    # --- Pack / Unpack / Bench Commands ---
+    parser_pack = subparsers.add_parser('pack', help='Store all notes in one packed file (re-run to compact it).')
+    parser_pack.set_defaults(func=pack_notes)
+    parser_unpack = subparsers.add_parser('unpack', help='Go back to one file per note.')
+    parser_unpack.set_defaults(func=unpack_notes)
+    parser_bench = subparsers.add_parser('bench', help='Compare list, view and backup time for loose vs packed notes.')
+    parser_bench.add_argument('-n', '--size', type=int, default=5000, help='Number of synthetic notes (default: %(default)s).')
+    parser_bench.add_argument('--views', type=int, default=200, help='Random note reads to time (default: %(default)s).')
+    parser_bench.set_defaults(func=bench_storage)
+
     args = parser.parse_args()
     args.func(args)
 
@@ -1,14 +1,34 @@
+import argparse
+import errno
+import fnmatch
+import hashlib
+import json
 import os
+import queue
+import re
+import signal
+import sys
+import threading
 import time
 import shutil
+import sqlite3
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import cached_property
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
 # --- CONFIGURATION ---
 # Path to the folder you want to watch (e.g., Downloads)
 WATCH_DIR = os.path.expanduser("~/Downloads")
+# Every folder that is watched and swept; add more roots here
+WATCH_DIRS = [WATCH_DIR]
+# Where the category folders are created; point it at shared storage (e.g. ~/storage/shared)
+# to sort onto another filesystem
+DEST_ROOT = WATCH_DIR
 
-# Mapping of file extensions to folder names
+# Mapping of file extensions to folder names (used when there is no rules file)
 DEST_DIRS = {
     "Documents": [".pdf", ".docx", ".txt", ".pptx", ".csv"],
     "Images": [".jpg", ".jpeg", ".png", ".gif", ".svg"],
@@ -18,36 +38,797 @@ DEST_DIRS = {
     "Code": [".py", ".js", ".html", ".css", ".sh"]
 }
 
+# Optional JSON rules file replacing DEST_DIRS (see README-organizer.md for the format)
+RULES_FILE = os.environ.get("ORGANIZER_RULES", os.path.expanduser("~/.config/organizer/rules.json"))
+
+# A file is only moved once its size and mtime have stayed the same for this long
+# (or straight away when its writer closes it)
+SETTLE_MS = 1000
+# Downloads still in progress; they are picked up when renamed to their real name
+PARTIAL_SUFFIXES = {".crdownload", ".part", ".partial"}
+
+MOVE_WORKERS = 4              # files moved in parallel
+COPY_CHUNK = 8 * 1024 * 1024  # bytes per copy step when moving across filesystems
+CLOSED = "closed"             # pending-entry marker: the writer closed the file, move without waiting
+SWEEP_BATCH = 256             # files handed to a mover thread at a time by --sweep
+
+# Record of every move, used for duplicate detection and `undo`
+LEDGER_FILE = os.environ.get("ORGANIZER_LEDGER", os.path.expanduser("~/.local/share/organizer/ledger.db"))
+
+# --- RULES ---
+# (offset, magic bytes, MIME type) for sniffing a file's real type from its first bytes
+MAGIC_NUMBERS = [
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (8, b"WAVE", "audio/wav"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"\xff\xfb", "audio/mpeg"),
+    (0, b"fLaC", "audio/flac"),
+    (0, b"OggS", "audio/ogg"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1a\x45\xdf\xa3", "video/x-matroska"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"Rar!\x1a\x07", "application/x-rar"),
+    (0, b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (0, b"\xfd7zXZ\x00", "application/x-xz"),
+    (0, b"BZh", "application/x-bzip2"),
+    (0, b"\x7fELF", "application/x-executable"),
+    (0, b"SQLite format 3\x00", "application/vnd.sqlite3"),
+]
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+def sniff_mime(path):
+    """MIME type from the file's magic bytes, or None if it is not one we know."""
+    with open(path, 'rb') as f:
+        head = f.read(32)
+    for offset, magic, mime in MAGIC_NUMBERS:
+        if head[offset:offset + len(magic)] == magic:
+            return mime
+    return None
+
+def parse_size(value):
+    """500, '10k', '1.5M', '2G' -> bytes."""
+    m = re.fullmatch(r"\s*([\d.]+)\s*([kmg]?)i?b?\s*", str(value).lower())
+    if not m:
+        raise ValueError(f"Invalid size '{value}' (use e.g. 500, 10k, 1.5M or 2G).")
+    return int(float(m.group(1)) * SIZE_UNITS[m.group(2)])
+
+def parse_age(value):
+    """'30d', '12h', '45m', '2w' (or plain seconds) -> seconds."""
+    m = re.fullmatch(r"\s*([\d.]+)\s*([smhdw]?)\s*", str(value).lower())
+    if not m:
+        raise ValueError(f"Invalid age '{value}' (use e.g. 45m, 12h, 30d or 2w).")
+    return float(m.group(1)) * AGE_UNITS[m.group(2) or "s"]
+
+class FileFacts:
+    """What rules may ask about a file, each looked up at most once and only when a rule needs it."""
+
+    def __init__(self, path, st=None):
+        self.path = path
+        if st is not None:
+            self.stat = st # already known (e.g. from a directory scan)
+
+    @cached_property
+    def stat(self):
+        return os.stat(self.path)
+
+    @cached_property
+    def mime(self):
+        return sniff_mime(self.path)
+
+class Rule:
+    """
+    One rule from the rules file. A file matches when every condition the rule sets holds:
+    'ext' (list), 'glob' or 'regex' on the name, 'min_size'/'max_size', 'mime' ('image/*' works)
+    and 'min_age'/'max_age' (by modification time).
+    """
+
+    def __init__(self, index, spec):
+        self.index = index
+        self.folder = spec["folder"]
+        self.name = spec.get("name", self.folder)
+        self.exts = {e.lower() if e.startswith(".") else "." + e.lower() for e in spec.get("ext", [])}
+        glob = spec.get("glob")
+        if glob and re.fullmatch(r"\*\.\w+", glob): # '*.pdf' is just an extension
+            self.exts.add(glob[1:].lower())
+            glob = None
+        self.glob = bool(glob)
+        # A glob must match the whole name; fnmatch.translate only anchors the end, so add the start
+        self.pattern = r"\A" + fnmatch.translate(glob) if glob else spec.get("regex")
+        try:
+            self.regex = re.compile(self.pattern, re.IGNORECASE) if self.pattern else None
+        except re.error as e:
+            raise ValueError(f"Rule '{self.name}': invalid {'glob' if glob else 'regex'}: {e}") from None
+        self.min_size = parse_size(spec["min_size"]) if "min_size" in spec else None
+        self.max_size = parse_size(spec["max_size"]) if "max_size" in spec else None
+        self.min_age = parse_age(spec["min_age"]) if "min_age" in spec else None
+        self.max_age = parse_age(spec["max_age"]) if "max_age" in spec else None
+        self.mime = spec.get("mime")
+
+    def matches_name(self, filename):
+        if self.glob:
+            return self.regex.fullmatch(filename) is not None
+        return self.regex.search(filename) is not None
+
+    def check(self, facts, filename):
+        """The conditions the name index could not settle, cheapest first."""
+        if self.regex and not self.matches_name(filename):
+            return False
+        if self.min_size is not None or self.max_size is not None:
+            size = facts.stat.st_size
+            if (self.min_size is not None and size < self.min_size) or (self.max_size is not None and size > self.max_size):
+                return False
+        if self.min_age is not None or self.max_age is not None:
+            age = time.time() - facts.stat.st_mtime
+            if (self.min_age is not None and age < self.min_age) or (self.max_age is not None and age > self.max_age):
+                return False
+        if self.mime:
+            mime = facts.mime
+            if mime is None or not fnmatch.fnmatchcase(mime, self.mime):
+                return False
+        return True
+
+class RuleMatcher:
+    """
+    Rules compiled for fast lookup. Extension rules sit in a dict keyed by extension; every
+    glob/regex rule is folded into one combined regex that rejects most names in a single pass.
+    Only the rules that survive are checked in order, so the first matching rule wins and the
+    cost barely grows with the number of rules. A regex that can't be combined safely (groups,
+    backreferences or global flags like '(?i)') is simply tested on its own.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.by_ext = {}
+        self.patterned = [] # rules with a name pattern covered by the combined prefilter
+        self.unfiltered = [] # rules with a name pattern that must be tried one by one
+        self.anyname = []   # rules that only look at size, age or content
+        for rule in rules:
+            if rule.regex:
+                (self.patterned if self._combinable(rule) else self.unfiltered).append(rule)
+            elif rule.exts:
+                for ext in rule.exts:
+                    self.by_ext.setdefault(ext, []).append(rule)
+            else:
+                self.anyname.append(rule)
+        self.combined = (re.compile("|".join(f"(?:{r.pattern})" for r in self.patterned), re.IGNORECASE)
+                         if self.patterned else None)
+
+    @staticmethod
+    def _combinable(rule):
+        if rule.regex.groups: # group numbers and names would clash once patterns are joined
+            return False
+        try:
+            re.compile(f"(?:)|(?:{rule.pattern})", re.IGNORECASE)
+        except re.error: # e.g. a leading '(?i)', only allowed at the very start
+            return False
+        return True
+
+    @classmethod
+    def load(cls, path=None):
+        """Rules from the JSON rules file if there is one, else the DEST_DIRS table."""
+        path = path or RULES_FILE
+        if os.path.exists(path):
+            with open(path) as f:
+                specs = json.load(f)
+            specs = specs.get("rules", []) if isinstance(specs, dict) else specs
+            source = path
+        else:
+            specs = [{"name": folder, "folder": folder, "ext": exts} for folder, exts in DEST_DIRS.items()]
+            source = "DEST_DIRS"
+        matcher = cls([Rule(i, spec) for i, spec in enumerate(specs)])
+        matcher.source = source
+        return matcher
+
+    def candidates(self, filename):
+        """Rules that the name alone does not rule out, in rule order. No disk access."""
+        ext = os.path.splitext(filename)[1].lower()
+        found = list(self.by_ext.get(ext, ()))
+        if self.combined and self.combined.search(filename):
+            found += [r for r in self.patterned if (not r.exts or ext in r.exts) and r.matches_name(filename)]
+        found += [r for r in self.unfiltered if (not r.exts or ext in r.exts) and r.matches_name(filename)]
+        found += self.anyname
+        return sorted(found, key=lambda r: r.index) if len(found) > 1 else found
+
+    def match(self, path, facts=None):
+        """The first rule matching the file at `path`, or None."""
+        filename = os.path.basename(path)
+        facts = facts or FileFacts(path)
+        for rule in self.candidates(filename):
+            if rule.check(facts, filename):
+                return rule
+        return None
+
+class SettleScheduler:
+    """
+    Per-path debounce. Every event for a path pushes its deadline back, so the hundreds of
+    modify events of a big download collapse into one pending entry. Once the deadline passes
+    and the file's size and mtime have not changed since the last look, the path is queued
+    for the mover thread.
+    """
+
+    def __init__(self, settle_ms=SETTLE_MS):
+        self.settle = settle_ms / 1000
+        self.pending = {} # path -> [deadline, (size, mtime_ns) at the last check]
+        self.cond = threading.Condition()
+        self.moves = queue.Queue()
+        self.stats = Counter()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def count(self, key):
+        with self.cond:
+            self.stats[key] += 1
+
+    def touch(self, path):
+        with self.cond:
+            self.stats['events'] += 1
+            if path in self.pending:
+                self.stats['coalesced'] += 1 # written again: settle afresh
+            self.pending[path] = [time.monotonic() + self.settle, None]
+            self.cond.notify()
+
+    def closed(self, path):
+        """The writer closed the file: no need to wait for it to settle."""
+        with self.cond:
+            self.stats['events'] += 1
+            self.stats['closed'] += 1
+            self.pending[path] = [time.monotonic(), CLOSED]
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                now = time.monotonic()
+                due = [path for path, (deadline, _) in self.pending.items() if deadline <= now]
+                if not due:
+                    next_deadline = min((d for d, _ in self.pending.values()), default=None)
+                    self.cond.wait(None if next_deadline is None else next_deadline - now)
+                    continue
+            for path in due:
+                with self.cond:
+                    entry = self.pending.get(path)
+                    if entry is not None and entry[1] == CLOSED:
+                        del self.pending[path]
+                        self.moves.put(path)
+                        continue
+                try:
+                    st = os.stat(path)
+                    seen = (st.st_size, st.st_mtime_ns)
+                except FileNotFoundError:
+                    seen = None
+                with self.cond:
+                    entry = self.pending.get(path)
+                    if entry is None or entry[0] > time.monotonic(): # closed, or touched again meanwhile
+                        continue
+                    if seen is None:
+                        del self.pending[path]
+                    elif seen == entry[1]:
+                        del self.pending[path]
+                        self.stats['settled'] += 1
+                        self.moves.put(path)
+                    else: # still growing: look again after another quiet period
+                        entry[:] = [time.monotonic() + self.settle, seen]
+
+    def summary(self):
+        with self.cond:
+            s = dict(self.stats)
+            waiting = len(self.pending)
+        return (f"Events: {s.get('events', 0)} ({s.get('coalesced', 0)} coalesced, {s.get('ignored', 0)} partial) | "
+                f"settled: {s.get('settled', 0)} | closed: {s.get('closed', 0)} | moved: {s.get('moved', 0)} | "
+                f"waiting: {waiting} | queued: {self.moves.qsize()}")
+
 class MoveHandler(FileSystemEventHandler):
+    """
+    Sorts only the file an event is about; the rest of the folder is never rescanned.
+    Events just feed the SettleScheduler, and a separate thread does the moves.
+    """
+
+    def __init__(self, scheduler, matcher, roots=WATCH_DIRS, ledger=None):
+        super().__init__()
+        self.scheduler = scheduler
+        self.matcher = matcher
+        self.roots = {os.path.abspath(root) for root in roots}
+        self.ledger = ledger
+        self.verbose = True
+        self.claimed = set() # destination names being moved into right now
+        self.claim_lock = threading.Lock()
+
+    def on_created(self, event):
+        self.handle(event, event.src_path)
+
     def on_modified(self, event):
-        for filename in os.listdir(WATCH_DIR):
-            file_ext = os.path.splitext(filename)[1].lower()
-            
-            for folder_name, extensions in DEST_DIRS.items():
-                if file_ext in extensions:
-                    self.move_file(filename, folder_name)
-
-    def move_file(self, filename, folder_name):
+        self.handle(event, event.src_path)
+
+    def on_moved(self, event):
+        # A rename inside Downloads (e.g. a finished 'video.mp4.part' -> 'video.mp4')
+        self.handle(event, event.dest_path)
+
+    def on_closed(self, event):
+        # Fired when a writer closes the file (Linux), i.e. the download has been written out
+        self.handle(event, event.src_path, closed=True)
+
+    def handle(self, event, path, closed=False):
+        if event.is_directory or os.path.dirname(path) not in self.roots:
+            return # our own moves into the category folders land here too
+        ext = os.path.splitext(path)[1].lower()
+        if ext in PARTIAL_SUFFIXES:
+            self.scheduler.count('ignored')
+            return
+        if not self.matcher.candidates(os.path.basename(path)):
+            return # no rule could apply, whatever the file holds
+        if closed:
+            self.scheduler.closed(path)
+        else:
+            self.scheduler.touch(path)
+
+    def start_movers(self, workers=MOVE_WORKERS):
+        """Bounded pool of mover threads; the watchdog thread itself never touches the disk."""
+        self.in_flight = set()
+        self.in_flight_lock = threading.Lock()
+        for _ in range(workers):
+            threading.Thread(target=self.process_moves, daemon=True).start()
+
+    def process_moves(self):
+        """Mover thread: takes settled paths off the queue until the process exits."""
+        while True:
+            path = self.scheduler.moves.get()
+            with self.in_flight_lock: # the same path queued twice must not be moved twice at once
+                busy = path in self.in_flight
+                self.in_flight.add(path)
+            try:
+                if not busy and os.path.isfile(path) and self.organize(path):
+                    self.scheduler.count('moved')
+            except Exception as e: # a mover thread must outlive any one file
+                print(f"Error moving {path}: {e}")
+            finally:
+                if not busy:
+                    with self.in_flight_lock:
+                        self.in_flight.discard(path)
+                self.scheduler.moves.task_done()
+
+    def organize(self, path, facts=None):
+        """Moves the file to the folder of the first rule it matches; True if it was moved."""
+        facts = facts or FileFacts(path)
+        if self.ledger and self.ledger.was_undone(path, facts.stat):
+            return False # put back by `undo`: leave it where the user wants it
+        rule = self.matcher.match(path, facts)
+        return bool(rule) and self.move_file(path, rule.folder, facts.stat)
+
+    def move_file(self, source, folder_name, st=None):
         # Create destination folder if it doesn't exist
-        dest_path = os.path.join(WATCH_DIR, folder_name)
-        if not os.path.exists(dest_path):
-            os.makedirs(dest_path)
-        
-        # Move the file
-        source = os.path.join(WATCH_DIR, filename)
-        destination = os.path.join(dest_path, filename)
-        
-        # Simple collision check: if file exists, don't overwrite
-        if not os.path.exists(destination):
-            shutil.move(source, destination)
-            print(f"Moved: {filename} -> {folder_name}/")
+        dest_path = os.path.join(DEST_ROOT, folder_name)
+        os.makedirs(dest_path, exist_ok=True)
+        st = st or os.stat(source)
+        filename = os.path.basename(source)
 
-if __name__ == "__main__":
-    event_handler = MoveHandler()
+        # Name collisions: an identical file is already sorted, a different one gets 'name (1).ext'
+        destination, duplicate, digest = self.free_name(source, os.path.join(dest_path, filename), st)
+        if duplicate:
+            os.remove(source)
+            if self.ledger:
+                self.ledger.record(source, duplicate, st, digest, 'duplicate')
+            if self.verbose:
+                print(f"Duplicate of {os.path.relpath(duplicate, DEST_ROOT)}, removed: {filename}")
+            return True
+
+        try:
+            if st.st_dev == os.stat(dest_path).st_dev:
+                os.rename(source, destination) # same filesystem: a metadata-only, atomic move
+            else:
+                copy_across(source, destination)
+                os.remove(source)
+        finally:
+            with self.claim_lock:
+                self.claimed.discard(destination)
+        if self.ledger:
+            self.ledger.record(source, destination, st, digest)
+        if self.verbose:
+            print(f"Moved: {filename} -> {os.path.relpath(destination, DEST_ROOT)}")
+        return True
+
+    def free_name(self, source, destination, st):
+        """
+        (destination, None, digest) with the first free 'name (n).ext', now claimed by the caller,
+        or (None, existing, digest) if one of the taken names already holds the same content.
+        Only a same-size collision is hashed (digest stays None otherwise), outside the claim
+        lock so other movers carry on, and a file the ledger has hashed before is not read again.
+        """
+        stem, ext = os.path.splitext(destination)
+        digest = None
+        n = 0
+        while True:
+            candidate = destination if n == 0 else f"{stem} ({n}){ext}"
+            with self.claim_lock:
+                if candidate in self.claimed:
+                    n += 1
+                    continue
+                try:
+                    existing = os.stat(candidate)
+                except FileNotFoundError:
+                    self.claimed.add(candidate)
+                    return candidate, None, digest
+            if existing.st_size == st.st_size:
+                digest = digest or file_hash(source)
+                known = self.ledger.known_hash(candidate, existing) if self.ledger else None
+                if not known:
+                    known = file_hash(candidate)
+                    if self.ledger:
+                        self.ledger.remember_hash(candidate, existing, known)
+                if known == digest:
+                    return None, candidate, digest
+            n += 1
+
+# Copy strategies for moves across filesystems, fastest first; one that the kernel or
+# filesystem refuses is dropped for the rest of the run
+_COPY_METHODS = ["copy_file_range", "sendfile", "readwrite"]
+_COPY_METHODS_LOCK = threading.Lock() # mover threads may drop the same method at once
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+def _copy_chunk(method, src_fd, dst_fd, offset, count):
+    if method == "copy_file_range":
+        return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+    if method == "sendfile":
+        os.lseek(dst_fd, offset, os.SEEK_SET)
+        return os.sendfile(dst_fd, src_fd, offset, count)
+    return os.pwrite(dst_fd, os.pread(src_fd, count, offset), offset)
+
+def _drop_copy_method(method):
+    with _COPY_METHODS_LOCK:
+        if method in _COPY_METHODS:
+            _COPY_METHODS.remove(method)
+
+def copy_across(source, destination):
+    """
+    Copies `source` to `destination` on another filesystem in COPY_CHUNK steps, in-kernel where
+    possible. The data goes to a hidden temp file that is fsync'd and then renamed into place,
+    so the destination never holds a partial file.
+    """
+    tmp = os.path.join(os.path.dirname(destination), f".{os.path.basename(destination)}.organizer-tmp")
+    try:
+        with open(source, 'rb') as fin, open(tmp, 'wb') as fout:
+            size = os.fstat(fin.fileno()).st_size
+            copied = 0
+            while copied < size:
+                method = next(m for m in tuple(_COPY_METHODS) if hasattr(os, m) or m == "readwrite")
+                try:
+                    n = _copy_chunk(method, fin.fileno(), fout.fileno(), copied, min(COPY_CHUNK, size - copied))
+                except OSError as e:
+                    if method == "readwrite" or e.errno not in _UNSUPPORTED:
+                        raise
+                    _drop_copy_method(method)
+                    continue
+                if n == 0: # short copy before the end: try the next method, never keep a partial file
+                    if method == "readwrite":
+                        raise OSError(errno.EIO, f"only {copied} of {size} bytes could be copied", source)
+                    _drop_copy_method(method)
+                    continue
+                copied += n
+            os.fsync(fout.fileno())
+        shutil.copystat(source, tmp)
+        os.rename(tmp, destination)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    dir_fd = os.open(os.path.dirname(destination), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+def file_hash(path):
+    """SHA-256 of a file's content, read in COPY_CHUNK pieces."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(COPY_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+class MoveLedger:
+    """
+    SQLite log of every move (source, destination, size, hash, time). It lets collisions reuse
+    known hashes and lets `undo` put files back; files restored by undo are not sorted again.
+    Shared by the mover threads, so every call takes the lock.
+    """
+
+    def __init__(self, path=LEDGER_FILE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS moves (
+                    id       INTEGER PRIMARY KEY,
+                    ts       REAL NOT NULL,
+                    source   TEXT NOT NULL,
+                    dest     TEXT NOT NULL,
+                    size     INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    hash     TEXT,
+                    action   TEXT NOT NULL DEFAULT 'moved',
+                    undone   INTEGER NOT NULL DEFAULT 0
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS moves_by_ts ON moves (ts)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS moves_by_source ON moves (source)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS moves_by_dest ON moves (dest)")
+        self.lock = threading.Lock()
+        self.autocommit = True # --sweep turns this off and commits once per batch instead
+        self.unsaved = []
+
+    def record(self, source, dest, st, digest, action='moved'):
+        with self.lock:
+            self.unsaved.append((time.time(), source, dest, st.st_size, st.st_mtime_ns, digest, action))
+        if self.autocommit:
+            self.commit()
+
+    def commit(self):
+        """Writes the recorded moves in one transaction."""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO moves (ts, source, dest, size, mtime_ns, hash, action) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self.unsaved)
+            self.unsaved = []
+
+    def known_hash(self, dest, st):
+        """Hash recorded for `dest` (see remember_hash), if the file has not changed since."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT hash FROM moves WHERE dest = ? AND size = ? AND mtime_ns = ? AND action = 'moved' "
+                "AND undone = 0 AND hash IS NOT NULL ORDER BY id DESC LIMIT 1",
+                (dest, st.st_size, st.st_mtime_ns)).fetchone()
+        return row[0] if row else None
+
+    def remember_hash(self, dest, st, digest):
+        """Fills in the hash of a moved-in file once a collision made us read it."""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE moves SET hash = ? WHERE dest = ? AND size = ? AND mtime_ns = ? AND hash IS NULL",
+                              (digest, dest, st.st_size, st.st_mtime_ns))
+
+    def was_undone(self, source, st):
+        """True for the very file an undo put back (same size and mtime), not a new one by that name."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT 1 FROM moves WHERE source = ? AND size = ? AND mtime_ns = ? AND undone = 1 LIMIT 1",
+                (source, st.st_size, st.st_mtime_ns)).fetchone() is not None
+
+    def since(self, ts):
+        """Moves not yet undone from `ts` on, newest first."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, source, dest, action FROM moves WHERE ts >= ? AND undone = 0 ORDER BY id DESC",
+                (ts,)).fetchall()
+
+    def mark_undone(self, move_id, undone=True):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE moves SET undone = ? WHERE id = ?", (int(undone), move_id))
+
+def parse_since(text):
+    """'2h', '30d' (that long ago) or 'YYYY-MM-DD [HH:MM]' -> epoch seconds."""
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            pass
+    return time.time() - parse_age(text)
+
+def undo(ledger, since, dry_run=False):
+    """
+    Puts back every move since `since`, newest first: moved files are moved back, and dropped
+    duplicates are restored by copying the file they duplicated. Each move is marked undone
+    before its file is touched, so a running watcher leaves the restored file alone; the mark
+    is taken back if the restore fails.
+    """
+    rows = ledger.since(since)
+    done, failed = 0, 0
+    start = time.perf_counter()
+    for move_id, source, dest, action in rows:
+        if dry_run:
+            print(f"Would restore: {dest} -> {source}" + (" (copy of duplicate)" if action == 'duplicate' else ""))
+            continue
+        ledger.mark_undone(move_id)
+        try:
+            if os.path.exists(source):
+                raise FileExistsError(f"{source} exists")
+            os.makedirs(os.path.dirname(source), exist_ok=True)
+            if action == 'duplicate':
+                shutil.copy2(dest, source)
+            elif os.stat(dest).st_dev == os.stat(os.path.dirname(source)).st_dev:
+                os.rename(dest, source)
+            else:
+                copy_across(dest, source)
+                os.remove(dest)
+            done += 1
+        except OSError as e:
+            ledger.mark_undone(move_id, False)
+            print(f"Cannot restore {dest}: {e}")
+            failed += 1
+    if dry_run:
+        print(f"{len(rows)} moves would be undone.")
+        return
+    print(f"✅ Undid {done} moves in {time.perf_counter() - start:.2f} s" + (f", {failed} failed." if failed else "."))
+
+def iter_files(roots, recursive=False, skip=()):
+    """
+    Streams a DirEntry for every file under `roots`, one directory listing at a time, so even
+    a huge folder is never held in memory. Hidden folders, symlinked folders and `skip` are
+    not descended into.
+    """
+    stack = [os.path.abspath(root) for root in reversed(roots)]
+    while stack:
+        top = stack.pop()
+        try:
+            with os.scandir(top) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and not entry.name.startswith('.') and entry.path not in skip:
+                            stack.append(entry.path)
+                    elif entry.is_file():
+                        yield entry
+        except OSError as e:
+            print(f"Skipping {top}: {e}")
+
+def category_dirs(matcher):
+    """The folders files are sorted into, which a recursive sweep must not re-sort."""
+    return {os.path.join(os.path.abspath(DEST_ROOT), rule.folder) for rule in matcher.rules}
+
+def sweep(handler, roots, recursive=False, batch_size=SWEEP_BATCH, workers=MOVE_WORKERS):
+    """
+    Organizes the files already sitting in `roots`. The directory scan streams batches of
+    `batch_size` files to `workers` threads, with at most a few batches in flight, and a
+    progress line reports files/s. Files modified within the last SETTLE_MS are left to the
+    watcher, since they may still be downloading.
+    """
+    stats = Counter()
+    start = time.perf_counter()
+    tty = sys.stdout.isatty()
+    last_report = start
+
+    def run_batch(entries):
+        done = Counter()
+        settle_before = time.time() - SETTLE_MS / 1000
+        for entry in entries:
+            try:
+                st = entry.stat()
+                if os.path.splitext(entry.name)[1].lower() in PARTIAL_SUFFIXES or st.st_mtime > settle_before:
+                    done['skipped'] += 1
+                elif handler.organize(entry.path, FileFacts(entry.path, st)):
+                    done['moved'] += 1
+                else:
+                    done['left'] += 1
+            except OSError as e:
+                print(f"Error moving {entry.path}: {e}")
+                done['errors'] += 1
+        if handler.ledger:
+            handler.ledger.commit()
+        return done
+
+    def report(final=False):
+        elapsed = time.perf_counter() - start
+        rate = stats['done'] / elapsed if elapsed else 0
+        line = (f"Swept {stats['done']}/{stats['scanned']} files | moved {stats['moved']} | "
+                f"left {stats['left']} | skipped {stats['skipped']} | errors {stats['errors']} | "
+                f"{elapsed:.1f} s, {rate:.0f} files/s")
+        if tty:
+            print(f"\r{line}", end="\n" if final else "", flush=True)
+        else:
+            print(line, flush=True)
+
+    handler.verbose = False # one progress line instead of a line per file
+    if handler.ledger:
+        handler.ledger.autocommit = False # a crash loses at most the batches in flight from the ledger
+    window = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def drain(limit):
+            nonlocal last_report
+            while len(window) > limit:
+                future, size = window.popleft()
+                stats.update(future.result())
+                stats['done'] += size
+                now = time.perf_counter()
+                if now - last_report >= (0.5 if tty else 5):
+                    last_report = now
+                    report()
+
+        batch = []
+        for entry in iter_files(roots, recursive, skip=category_dirs(handler.matcher)):
+            stats['scanned'] += 1
+            batch.append(entry)
+            if len(batch) == batch_size:
+                window.append((pool.submit(run_batch, batch), len(batch)))
+                batch = []
+                drain(workers * 2)
+        if batch:
+            window.append((pool.submit(run_batch, batch), len(batch)))
+        drain(0)
+    handler.verbose = True
+    if handler.ledger:
+        handler.ledger.autocommit = True
+        handler.ledger.commit()
+    report(final=True)
+    return stats
+
+def dry_run(matcher, roots, recursive=False):
+    """Matches every file in `roots` against the rules without moving anything."""
+    files = [entry.path for entry in iter_files(roots, recursive, skip=category_dirs(matcher))]
+
+    start = time.perf_counter()
+    planned = []
+    for path in files:
+        rule = matcher.match(path)
+        planned.append((path, rule))
+    elapsed = time.perf_counter() - start
+
+    counts = Counter(rule.index if rule else None for _, rule in planned)
+    for path, rule in planned:
+        if rule:
+            print(f"Would move: {os.path.basename(path)} -> {rule.folder}/  [{rule.name}]")
+    print(f"\n--- Dry run: {len(files)} files in {', '.join(roots)} (rules: {matcher.source}) ---")
+    print(f"{'rule':<24} {'folder':<24} {'matches':>8}")
+    for rule in matcher.rules:
+        print(f"{rule.name[:24]:<24} {rule.folder[:24]:<24} {counts.get(rule.index, 0):>8}")
+    print(f"{'(no rule)':<24} {'':<24} {counts.get(None, 0):>8}")
+    per_file = elapsed * 1e6 / len(files) if files else 0
+    print(f"Evaluated {len(matcher.rules)} rules in {elapsed * 1000:.1f} ms ({per_file:.1f} µs/file).")
+
+def main():
+    parser = argparse.ArgumentParser(description="Sorts new files in the watch folder into category folders.")
+    parser.add_argument("--rules", default=None, help=f"JSON rules file (default: $ORGANIZER_RULES or {RULES_FILE})")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Show where each file in the watch folder would go, with per-rule counts, and exit")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Organize the files already in the watch folders, report throughput, and exit")
+    parser.add_argument("--root", action="append", metavar="DIR",
+                        help="Folder to watch or sweep instead of WATCH_DIRS (repeatable)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Also sweep subfolders (--sweep and --dry-run)")
+    parser.add_argument("--batch", type=int, default=SWEEP_BATCH, help=f"Files per sweep batch (default: {SWEEP_BATCH})")
+    subparsers = parser.add_subparsers(dest="command")
+    undo_parser = subparsers.add_parser("undo", help="Move files back to where they came from, newest first")
+    undo_parser.add_argument("--since", required=True,
+                             help="Undo moves made since then: an age (30m, 2h, 1d) or 'YYYY-MM-DD [HH:MM]'")
+    undo_parser.add_argument("-n", "--dry-run", action="store_true", help="Only list what would be put back")
+    args = parser.parse_args()
+    roots = [os.path.abspath(os.path.expanduser(root)) for root in (args.root or WATCH_DIRS)]
+
+    if args.command == "undo":
+        try:
+            since = parse_since(args.since)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        undo(MoveLedger(), since, args.dry_run)
+        return
+
+    try:
+        matcher = RuleMatcher.load(args.rules)
+    except (OSError, ValueError, KeyError, re.error) as e:
+        print(f"Error loading rules: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.dry_run:
+        dry_run(matcher, roots, args.recursive)
+        return
+    if args.sweep:
+        sweep(MoveHandler(None, matcher, roots, MoveLedger()), roots, args.recursive, max(1, args.batch))
+        return
+
+    scheduler = SettleScheduler()
+    event_handler = MoveHandler(scheduler, matcher, roots, MoveLedger())
+    event_handler.start_movers()
     observer = Observer()
-    observer.schedule(event_handler, WATCH_DIR, recursive=False)
+    for root in roots:
+        observer.schedule(event_handler, root, recursive=False)
+
+    # `pkill -USR1 -f organizer.py` prints the event/coalescing counters
+    signal.signal(signal.SIGUSR1, lambda *_: print(scheduler.summary(), flush=True))
     
-    print(f"Monitoring: {WATCH_DIR}...")
+    print(f"Monitoring: {', '.join(roots)}...")
     observer.start()
     try:
         while True:
@@ -55,3 +836,7 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         observer.stop()
     observer.join()
+    print(scheduler.summary())
+
+if __name__ == "__main__":
+    main()